@@ -1,8 +1,374 @@
 from ortools.sat.python import cp_model
+import argparse
+import array
+import collections
+import concurrent.futures
+import contextlib
+import copy
+import datetime
+import functools
+import hashlib
+import itertools
+import json
+import math
+import os
 import random
+import re
+import time
+
+import schedule_export
+import schedule_validator
+import solution_store
+
+class SolverConfig:
+    def __init__(self, num_search_workers=0, max_time_in_seconds=None, random_seed=None,
+                 log_search_progress=False, hints=None):
+        # Paramètres appliqués à chaque appel du solveur CP-SAT (0 worker = valeur par défaut d'OR-Tools)
+        self.num_search_workers = num_search_workers
+        self.max_time_in_seconds = max_time_in_seconds
+        self.random_seed = random_seed
+        self.log_search_progress = log_search_progress
+        # Indications de solution : nom de variable -> valeur
+        self.hints = dict(hints or {})
+
+    def apply(self, solver, model=None):
+        if self.num_search_workers:
+            solver.parameters.num_search_workers = self.num_search_workers
+        if self.max_time_in_seconds is not None:
+            solver.parameters.max_time_in_seconds = self.max_time_in_seconds
+        if self.random_seed is not None:
+            solver.parameters.random_seed = self.random_seed
+        solver.parameters.log_search_progress = self.log_search_progress
+        if model is not None and self.hints:
+            add_named_hints(model, self.hints)
+
+def add_named_hints(model, hints):
+    # Indications par nom de variable ; celles dont la variable n'existe pas dans ce modèle (ou déjà indiquée)
+    # sont ignorées
+    hinted = set(model.Proto().solution_hint.vars)
+    for index, var in enumerate(model.Proto().variables):
+        if var.name in hints and index not in hinted:
+            model.AddHint(model.GetIntVarFromProtoIndex(index), hints[var.name])
+
+CONSTRAINT_KINDS = (
+    'linear', 'bool_or', 'bool_and', 'at_most_one', 'exactly_one', 'bool_xor', 'all_diff', 'element', 'lin_max',
+    'int_prod', 'int_div', 'int_mod', 'table', 'automaton', 'inverse', 'circuit', 'routes', 'reservoir',
+    'interval', 'no_overlap', 'no_overlap_2d', 'cumulative'
+)
+
+def constraint_kind(constraint):
+    # Type d'une contrainte du proto (protobuf classique ou liaison native des versions récentes d'OR-Tools)
+    if hasattr(constraint, 'WhichOneof'):
+        return constraint.WhichOneof('constraint')
+    return next((kind for kind in CONSTRAINT_KINDS if getattr(constraint, f'has_{kind}')()), None)
+
+class ModelMetrics:
+    # Mesures d'une exécution : taille et temps de construction des modèles, statistiques CP-SAT,
+    # temps par étape et compteurs (matchs écartés par le placement glouton, doublons supprimés...)
+    def __init__(self):
+        self.models = []
+        self.solves = []
+        self.stages = {}
+        self.counters = {}
+        self.conflicts = []
+        self.hooks = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        # Les hooks reçoivent (étape, 'start' | 'end', infos) ; infos['seconds'] est rempli à la fin
+        info = {}
+        for hook in self.hooks:
+            hook(name, 'start', info)
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            info['seconds'] = time.perf_counter() - start
+            totals = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0})
+            totals['calls'] += 1
+            totals['seconds'] += info['seconds']
+            for hook in self.hooks:
+                hook(name, 'end', info)
+
+    def record_model(self, stage, model, build_seconds):
+        proto = model.Proto()
+        constraint_types = collections.Counter(constraint_kind(constraint) for constraint in proto.constraints)
+        self.models.append({
+            'stage': stage,
+            'num_variables': len(proto.variables),
+            'num_constraints': len(proto.constraints),
+            'constraint_types': dict(constraint_types),
+            'build_seconds': build_seconds
+        })
+
+    def record_solve(self, stage, solver, status, has_objective=False):
+        self.solves.append({
+            'stage': stage,
+            'status': solver.StatusName(status),
+            'wall_time': solver.WallTime(),
+            'user_time': solver.UserTime(),
+            'branches': solver.NumBranches(),
+            'conflicts': solver.NumConflicts(),
+            'objective': solver.ObjectiveValue() if has_objective else None,
+            'best_objective_bound': solver.BestObjectiveBound() if has_objective else None
+        })
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def report(self):
+        return {
+            'stages': self.stages,
+            'models': self.models,
+            'solves': self.solves,
+            'counters': self.counters,
+            'conflicts': self.conflicts
+        }
+
+    def to_json(self, path=None):
+        text = json.dumps(self.report(), indent=2)
+        if path:
+            with open(path, "w") as output:
+                output.write(text)
+        return text
+
+def timed_stage(stage, model_attr=None):
+    # Chronomètre une méthode de MyModel comme étape et, pour une construction, enregistre la taille du modèle
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.stage(stage) as info:
+                result = method(self, *args, **kwargs)
+            if model_attr:
+                self.metrics.record_model(stage, getattr(self, model_attr), info['seconds'])
+            return result
+        return wrapper
+    return decorator
+
+class ConstraintGroups:
+    # Groupes de contraintes nommés d'un modèle ("pays hôte dans le groupe A", limites des chapeaux...), chacun
+    # conditionné par un littéral d'activation. Les littéraux sont fixés à 1 : le presolve les élimine et la
+    # résolution normale n'en paie pas le prix. En cas d'infaisabilité, explain() les libère dans une copie
+    # du modèle et la résout une fois avec les littéraux en hypothèses : CP-SAT renvoie un ensemble de
+    # groupes suffisant pour l'infaisabilité (SufficientAssumptionsForInfeasibility).
+    def __init__(self, model):
+        self.model = model
+        self.literals = {}
+
+    def add(self, name, constraint):
+        if name not in self.literals:
+            literal = self.model.NewBoolVar(f"enforce_{name}")
+            self.model.Proto().variables[literal.Index()].domain[0] = 1
+            self.literals[name] = literal
+        return constraint.OnlyEnforceIf(self.literals[name])
+
+    def explain(self, solver_config, max_time_in_seconds=None):
+        # Noms des groupes en conflit ; [] si la copie n'est pas prouvée infaisable dans le temps imparti
+        model = self.model.Clone()
+        model.ClearObjective()
+        model.ClearHints()
+        model.ClearAssumptions()
+        for literal in self.literals.values():
+            model.Proto().variables[literal.Index()].domain[0] = 0
+        model.AddAssumptions(self.literals.values())
+        solver = cp_model.CpSolver()
+        solver_config.apply(solver, model)
+        if max_time_in_seconds is not None:
+            solver.parameters.max_time_in_seconds = max_time_in_seconds
+        if solver.Solve(model) != cp_model.INFEASIBLE:
+            return []
+        names = {literal.Index(): name for name, literal in self.literals.items()}
+        return [names[index] for index in solver.SufficientAssumptionsForInfeasibility() if index in names]
+
+class Match:
+    # Match indexé : codes d'équipes, de jour (dans data.calendar), de créneau et de stade
+    __slots__ = ('team1', 'team2', 'day', 'time_slot', 'stadium')
+
+    def __init__(self, team1, team2, day, time_slot, stadium):
+        self.team1 = team1
+        self.team2 = team2
+        self.day = day
+        self.time_slot = time_slot
+        self.stadium = stadium
+
+    def names(self, data):
+        return (data.teams[self.team1], data.teams[self.team2], data.calendar[self.day],
+                data.time_slots[self.time_slot], data.stadiums[self.stadium])
+
+def count_draws(data):
+    # Tirages possibles (pays hôte dans le groupe du match d'ouverture : chaque chapeau est une permutation
+    # sur les groupes) et tirages canoniques, distincts à un renommage des autres groupes près
+    num_groups = len(data.groups)
+    draws = math.factorial(num_groups - 1) * math.factorial(num_groups) ** (len(data.chapeaus) - 1)
+    return {'draws': draws, 'canonical_draws': draws // math.factorial(num_groups - 1)}
+
+def generate_knockout_rounds(group_names, first_match_id=None):
+    # Tableau final générique : les deux premiers de chaque groupe, complétés par les meilleurs troisièmes
+    # jusqu'à une puissance de deux ; deux matchs par jour (6pm, 9pm), un seul à partir des demi-finales.
+    # Numéros de match à partir de first_match_id (par défaut après les matchs de groupes de quatre équipes)
+    num_groups = len(group_names)
+    letters = [group_name[-1] for group_name in group_names]
+    num_qualified = 1
+    while num_qualified < 2 * num_groups:
+        num_qualified *= 2
+    entrants = ([f"1{letter}" for letter in letters] + [f"2{letter}" for letter in letters]
+                + [f"3rd_{i + 1}" for i in range(num_qualified - 2 * num_groups)])
+    matchups = [(entrants[i], entrants[num_qualified - 1 - i]) for i in range(num_qualified // 2)]
+    phase_names = {1: 'final', 2: 'semi_final', 4: 'quarter_final'}
+    knockout_rounds = []
+    match_id = first_match_id or 6 * num_groups + 1
+    day = 1
+    while matchups:
+        num_matches = len(matchups)
+        time_slots = ['6pm', '9pm'] if num_matches >= 4 else ['9pm']
+        num_days = -(-num_matches // len(time_slots))
+        knockout_rounds.append({
+            'phase': phase_names.get(num_matches, f"round_of_{2 * num_matches}"),
+            'days': [f"KO_Day_{day + i:02d}" for i in range(num_days)],
+            'time_slots': time_slots,
+            'matchups': matchups
+        })
+        day += num_days
+        winners = [f"W{match_id + i}" for i in range(num_matches)]
+        match_id += num_matches
+        matchups = [(winners[i], winners[i + 1]) for i in range(0, len(winners), 2)] if num_matches > 1 else []
+    return knockout_rounds
+
+# Répertoire du cache des tables de meilleurs troisièmes (une table par tableau final)
+THIRD_PLACE_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "third_place_tables")
+
+def third_place_slots(matchups, group_names):
+    # Places de meilleurs troisièmes d'un premier tour de phase finale : (indice du match, côté, groupes admis).
+    # '3A/D/E/F' n'accepte que les troisièmes des groupes A, D, E et F ; une désignation générique ('3rd_1')
+    # accepte tous les groupes sauf celui de l'adversaire.
+    letters = [group_name[-1] for group_name in group_names]
+    slots = []
+    for index, matchup in enumerate(matchups):
+        for side, (label, opponent) in enumerate((matchup, matchup[::-1])):
+            if not label.startswith('3'):
+                continue
+            if label.startswith('3rd_'):
+                allowed = tuple(g for g, letter in enumerate(letters) if opponent[1:] != letter)
+            else:
+                allowed = tuple(letters.index(letter) for letter in label[1:].split('/'))
+            slots.append((index, side, allowed))
+    return slots
+
+def matchup_sources(matchup, letters):
+    # Origines possibles des équipes d'un match de phase finale : numéros des matchs dont les vainqueurs s'y
+    # rencontrent ('W37') et lettres des groupes dont une équipe peut s'y présenter ('1A', '3A/D/E/F', '3rd_1')
+    feeders = []
+    group_letters = set()
+    for label in matchup:
+        if label.startswith('W'):
+            feeders.append(int(label[1:]))
+        else:
+            group_letters.update(letters if label.startswith('3rd_') else label[1:].split('/'))
+    return feeders, sorted(group_letters)
+
+class ThirdPlaceTable:
+    # Affectation des meilleurs troisièmes aux places du premier tour, précalculée pour chaque combinaison de
+    # groupes qualifiés (15 pour l'EURO : 4 parmi 6). Entrée i = groupes placés dans chaque place lorsque
+    # les troisièmes qualifiés sont ceux des groupes du masque i (bit g = groupe g), None si i n'est pas une
+    # combinaison possible : la consultation est un simple accès indexé.
+    def __init__(self, slots, num_groups, assignments):
+        self.slots = slots
+        self.num_groups = num_groups
+        self.assignments = assignments
+
+    def __getitem__(self, mask):
+        return self.assignments[mask]
+
+    def lookup(self, qualified_groups):
+        return self.assignments[sum(1 << g for g in qualified_groups)]
+
+    @classmethod
+    def build(cls, slots, num_groups):
+        # Un petit modèle CP-SAT par combinaison : chaque place reçoit un groupe admis, chaque groupe qualifié
+        # une place ; parmi les affectations valides, la plus petite dans l'ordre lexicographique des places
+        # (objectif pondéré), pour une table identique d'une construction à l'autre
+        assignments = [None] * (1 << num_groups)
+        for qualified_groups in itertools.combinations(range(num_groups), len(slots)):
+            model = cp_model.CpModel()
+            slot_vars = {(s, g): model.NewBoolVar(f"slot_{s}_group_{g}")
+                         for s, (_, _, allowed) in enumerate(slots) for g in qualified_groups if g in allowed}
+            for s in range(len(slots)):
+                model.AddExactlyOne(var for (slot, g), var in slot_vars.items() if slot == s)
+            for g in qualified_groups:
+                model.AddExactlyOne(var for (s, group), var in slot_vars.items() if group == g)
+            model.Minimize(sum(g * num_groups ** (len(slots) - 1 - s) * var for (s, g), var in slot_vars.items()))
+            solver = cp_model.CpSolver()
+            solver.parameters.num_search_workers = 1
+            if solver.Solve(model) != cp_model.OPTIMAL:
+                raise ValueError(f"no valid assignment of the third-placed teams of groups {qualified_groups}")
+            assignments[sum(1 << g for g in qualified_groups)] = tuple(
+                next(g for g in qualified_groups if (s, g) in slot_vars and solver.Value(slot_vars[(s, g)]))
+                for s in range(len(slots)))
+        return cls(slots, num_groups, assignments)
+
+    @classmethod
+    def load_or_build(cls, slots, num_groups, cache_dir=THIRD_PLACE_CACHE):
+        # Table lue depuis le cache si elle existe et reste valide pour ces places, sinon construite et enregistrée
+        signature = hashlib.sha1(json.dumps([num_groups, slots]).encode()).hexdigest()[:12]
+        path = os.path.join(cache_dir, f"{num_groups}_groups_{signature}.json")
+        try:
+            with open(path) as cache_file:
+                table = cls.from_dict(json.load(cache_file))
+            if table.slots == slots and table.num_groups == num_groups and table.is_valid():
+                return table
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        table = cls.build(slots, num_groups)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(path, "w") as cache_file:
+                json.dump(table.to_dict(), cache_file)
+        except OSError:
+            pass  # Cache en lecture seule : la table reste en mémoire
+        return table
+
+    def is_valid(self):
+        # Chaque combinaison a une affectation, qui respecte les groupes admis et utilise chaque groupe une fois
+        for qualified_groups in itertools.combinations(range(self.num_groups), len(self.slots)):
+            assignment = self.lookup(qualified_groups)
+            if (assignment is None or sorted(assignment) != list(qualified_groups)
+                    or any(g not in allowed for g, (_, _, allowed) in zip(assignment, self.slots))):
+                return False
+        return True
+
+    def to_dict(self):
+        return {
+            'num_groups': self.num_groups,
+            'slots': [[index, side, list(allowed)] for index, side, allowed in self.slots],
+            'assignments': {str(mask): list(assignment)
+                            for mask, assignment in enumerate(self.assignments) if assignment is not None}
+        }
+
+    @classmethod
+    def from_dict(cls, table):
+        num_groups = table['num_groups']
+        assignments = [None] * (1 << num_groups)
+        for mask, assignment in table['assignments'].items():
+            assignments[int(mask)] = tuple(assignment)
+        slots = [(index, side, tuple(allowed)) for index, side, allowed in table['slots']]
+        return cls(slots, num_groups, assignments)
+
+def day_ordinal(day, year):
+    # Numéro ordinal de la date d'un jour nommé "Weekday_JJ_MM" (None si le nom ne contient pas de date)
+    match = re.search(r"_(\d{2})_(\d{2})$", day)
+    if not match:
+        return None
+    return datetime.date(year, int(match.group(2)), int(match.group(1))).toordinal()
+
+def haversine_km(location1, location2):
+    # Distance à vol d'oiseau entre deux points (latitude, longitude) en degrés
+    lat1, lon1, lat2, lon2 = map(math.radians, (*location1, *location2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
 
 class TournamentData:
-    def __init__(self):
+    def __init__(self, solver_config=None):
+        self.solver_config = solver_config or SolverConfig()
         # Initialisation des équipes et des chapeaux
         self.teams = [
             "Germany", "England", "Albania", "Austria", "Belgium", "Croatia", "Denmark",
@@ -30,6 +396,21 @@ class TournamentData:
             "Deutsche_Bank_Park", "Volksparkstadion", "Allianz_Arena", "MHPArena",
             "Red_Bull_Arena", "Veltins_Arena"
         ]
+        # Coordonnées (latitude, longitude) des stades, pour les distances parcourues par les équipes
+        self.stadium_locations = {
+            "Olympiastadion": (52.5147, 13.2395), "RheinEnergieStadion": (50.9336, 6.8750),
+            "Signal_Iduna_Park": (51.4926, 7.4519), "Merkur_Spiel_Arena": (51.2617, 6.7331),
+            "Deutsche_Bank_Park": (50.0686, 8.6455), "Volksparkstadion": (53.5872, 9.8986),
+            "Allianz_Arena": (48.2188, 11.6247), "MHPArena": (48.7923, 9.2320),
+            "Red_Bull_Arena": (51.3458, 12.3483), "Veltins_Arena": (51.5546, 7.0676)
+        }
+        # Nombre minimal de jours de repos entre deux matchs d'une même équipe
+        self.min_rest_days = 2
+        # Nombre maximal de matchs de la phase finale dans un même stade
+        self.max_knockout_matches_per_stadium = 2
+        # Année du calendrier ; day_numbers (jour -> numéro) remplace si besoin les dates lues dans les noms
+        self.year = 2024
+        self.day_numbers = None
         self.time_slots = ["3pm", "6pm", "9pm"]
         self.days = [
             "Friday_14_06", "Saturday_15_06", "Sunday_16_06", "Monday_17_06",
@@ -46,288 +427,1631 @@ class TournamentData:
             'group_E': [],
             'group_F': []
         }
+        # Match d'ouverture et finale
+        self.host_team = "Germany"
+        self.opening_match = {'group': 'group_A', 'day': "Friday_14_06", 'time_slot': "9pm", 'stade': "Allianz_Arena"}
+        self.final_stadium = "Olympiastadion"
+        # Jours et créneaux autorisés pour chaque journée de groupe
+        # (la dernière journée se joue à 6pm et 9pm, deux matchs simultanés par groupe)
+        self.journey_days = {1: self.days[0:5], 2: self.days[5:9], 3: self.days[9:]}
+        self.journey_time_slots = {1: self.time_slots, 2: self.time_slots, 3: ["6pm", "9pm"]}
+        self.simultaneous_last_journey = True
+        # Calendrier et tableau de la phase finale
+        self.knockout_rounds = [
+            {'phase': 'round_of_16',
+             'days': ['Saturday_29_06', 'Sunday_30_06', 'Monday_01_07', 'Tuesday_02_07'],
+             'time_slots': ['6pm', '9pm'],
+             'matchups': [('1A', '2C'), ('2A', '2B'), ('1B', '3A/D/E/F'), ('1C', '3D/E/F'),
+                          ('1F', '3A/B/C'), ('2D', '2E'), ('1E', '3A/B/C/D'), ('1D', '2F')]},
+            {'phase': 'quarter_final',
+             'days': ['Friday_05_07', 'Saturday_06_07'],
+             'time_slots': ['6pm', '9pm'],
+             'matchups': [('W39', 'W37'), ('W41', 'W42'), ('W43', 'W44'), ('W40', 'W38')]},
+            {'phase': 'semi_final',
+             'days': ['Tuesday_09_07', 'Wednesday_10_07'],
+             'time_slots': ['9pm'],
+             'matchups': [('W45', 'W46'), ('W47', 'W48')]},
+            {'phase': 'final',
+             'days': ['Sunday_14_07'],
+             'time_slots': ['9pm'],
+             'matchups': [('W49', 'W50')]}
+        ]
+        self.build_index()
+
+    @classmethod
+    def from_config(cls, config, solver_config=None):
+        # Format de tournoi lu depuis un fichier JSON (chemin) ou un dictionnaire de même structure, voir
+        # formats/euro2024.json. Clés facultatives : teams (ordre des équipes, sinon celui des chapeaux), groups
+        # (sinon num_groups groupes nommés group_A, group_B...), time_slots de chaque journée (sinon tous),
+        # knockout_rounds (sinon tableau généré), day_numbers (sinon dates lues dans les noms des jours),
+        # simultaneous_last_journey, min_rest_days, max_knockout_matches_per_stadium et year.
+        # Les stades sont une liste de noms ou un dictionnaire nom -> [latitude, longitude].
+        if isinstance(config, str):
+            with open(config) as config_file:
+                config = json.load(config_file)
+        data = cls(solver_config)
+        data.chapeaus = {pot: list(teams) for pot, teams in config['pots'].items()}
+        data.teams = list(config.get('teams') or [team for teams in data.chapeaus.values() for team in teams])
+        group_names = config.get('groups') or [f"group_{chr(ord('A') + g)}" for g in range(config['num_groups'])]
+        data.groups = {group_name: [] for group_name in group_names}
+        data.group_matches = {group_name: [] for group_name in group_names}
+        stadiums = config['stadiums']
+        data.stadiums = list(stadiums)
+        data.stadium_locations = {stadium: tuple(stadiums[stadium]) if isinstance(stadiums, dict) else (0.0, 0.0)
+                                  for stadium in data.stadiums}
+        data.time_slots = list(config['time_slots'])
+        data.days = list(config['days'])
+        data.journey_days = {}
+        data.journey_time_slots = {}
+        for journey, rules in enumerate(config['journeys'], start=1):
+            data.journey_days[journey] = list(rules['days'])
+            data.journey_time_slots[journey] = list(rules.get('time_slots', data.time_slots))
+        data.phase = [f"group_journey_{journey}" for journey in data.journey_days]
+        data.simultaneous_last_journey = config.get('simultaneous_last_journey', True)
+        data.host_team = config['host_team']
+        data.opening_match = dict(config['opening_match'])
+        data.final_stadium = config['final_stadium']
+        data.min_rest_days = config.get('min_rest_days', data.min_rest_days)
+        data.max_knockout_matches_per_stadium = config.get('max_knockout_matches_per_stadium',
+                                                           data.max_knockout_matches_per_stadium)
+        data.year = config.get('year', data.year)
+        data.day_numbers = config.get('day_numbers')
+        if 'knockout_rounds' in config:
+            data.knockout_rounds = [dict(knockout_round, matchups=[tuple(matchup) for matchup in knockout_round['matchups']])
+                                    for knockout_round in config['knockout_rounds']]
+        else:
+            group_size = len(data.chapeaus)
+            data.knockout_rounds = generate_knockout_rounds(
+                group_names, len(group_names) * group_size * (group_size - 1) // 2 + 1)
+        # Numérotation complétée dès qu'un jour du calendrier (groupes ou phase finale) n'a ni numéro ni date
+        calendar = data.days + [day for knockout_round in data.knockout_rounds for day in knockout_round['days']]
+        if not all(day in (data.day_numbers or {}) or day_ordinal(day, data.year) is not None for day in calendar):
+            data.number_days()
+        data.validate()
+        data.build_index()
+        return data
+
+    def to_config(self):
+        # Opération inverse de from_config (par exemple pour écrire un format dérivé de celui-ci)
+        config = {
+            'year': self.year,
+            'teams': list(self.teams),
+            'pots': {pot: list(teams) for pot, teams in self.chapeaus.items()},
+            'groups': list(self.groups),
+            'stadiums': {stadium: list(self.stadium_locations[stadium]) for stadium in self.stadiums},
+            'time_slots': list(self.time_slots),
+            'days': list(self.days),
+            'journeys': [{'days': list(self.journey_days[journey]), 'time_slots': list(self.journey_time_slots[journey])}
+                         for journey in self.journey_days],
+            'simultaneous_last_journey': self.simultaneous_last_journey,
+            'host_team': self.host_team,
+            'opening_match': dict(self.opening_match),
+            'final_stadium': self.final_stadium,
+            'min_rest_days': self.min_rest_days,
+            'max_knockout_matches_per_stadium': self.max_knockout_matches_per_stadium,
+            'knockout_rounds': [dict(knockout_round, matchups=[list(matchup) for matchup in knockout_round['matchups']])
+                                for knockout_round in self.knockout_rounds]
+        }
+        if self.day_numbers is not None:
+            config['day_numbers'] = dict(self.day_numbers)
+        return config
+
+    def number_days(self):
+        # Jours numérotés : numéros donnés pour tous les jours de groupes, sinon dates lues dans les noms si tous en
+        # ont (sinon jours de groupes consécutifs), puis chaque tour de la phase finale sans numéros ni dates
+        # commence après les jours de repos requis
+        if self.day_numbers is not None and all(day in self.day_numbers for day in self.days):
+            self.day_numbers = dict(self.day_numbers)
+        elif all(day_ordinal(day, self.year) is not None for day in self.days):
+            self.day_numbers = {day: day_ordinal(day, self.year) for day in self.days}
+        else:
+            self.day_numbers = {day: i for i, day in enumerate(self.days)}
+        number = max(self.day_numbers.values())
+        for knockout_round in self.knockout_rounds:
+            if all(day in self.day_numbers for day in knockout_round['days']):
+                number = max(number, *(self.day_numbers[day] for day in knockout_round['days']))
+                continue
+            ordinals = [day_ordinal(day, self.year) for day in knockout_round['days']]
+            if all(ordinal is not None for ordinal in ordinals):
+                self.day_numbers.update(zip(knockout_round['days'], ordinals))
+                number = max(number, *ordinals)
+                continue
+            number += self.min_rest_days + 1
+            for day in knockout_round['days']:
+                self.day_numbers[day] = number
+                number += 1
+            number -= 1
+
+    def validate(self):
+        # Cohérence d'un format : une équipe de chaque chapeau par groupe, journées du round robin, références
+        # aux équipes, jours, créneaux et stades existants
+        num_groups = len(self.groups)
+        if any(len(teams) != num_groups for teams in self.chapeaus.values()):
+            raise ValueError(f"every pot must hold one team per group ({num_groups})")
+        if sorted(self.teams) != sorted(team for teams in self.chapeaus.values() for team in teams):
+            raise ValueError("teams must be exactly the teams of the pots")
+        group_size = len(self.chapeaus)
+        if len(self.journey_days) != group_size - 1 + group_size % 2:
+            raise ValueError(f"groups of {group_size} teams need {group_size - 1 + group_size % 2} journeys, "
+                             f"got {len(self.journey_days)}")
+        for journey, days in self.journey_days.items():
+            if not days or not set(days) <= set(self.days) \
+                    or not set(self.journey_time_slots[journey]) <= set(self.time_slots):
+                raise ValueError(f"journey {journey} uses unknown days or time slots")
+        opening = self.opening_match
+        if self.host_team not in self.teams or opening['group'] not in self.groups \
+                or opening['day'] not in self.days or opening['time_slot'] not in self.time_slots \
+                or opening['stade'] not in self.stadiums or self.final_stadium not in self.stadiums:
+            raise ValueError("opening match or final refers to an unknown team, group, day, time slot or stadium")
+        if opening['day'] != self.journey_days[1][0]:
+            raise ValueError("the opening match must be on the first day of the first journey")
+        for knockout_round in self.knockout_rounds:
+            if not set(knockout_round['time_slots']) <= set(self.time_slots):
+                raise ValueError(f"{knockout_round['phase']} uses unknown time slots")
+
+    @classmethod
+    def synthetic(cls, num_teams=24, num_stadiums=10, extra_days=0, solver_config=None):
+        # Tournoi fictif paramétré pour les bancs d'essai : groupes de quatre (un chapeau par position),
+        # fenêtres de jours juste suffisantes pour chaque journée, plus extra_days répartis entre elles. Les
+        # fenêtres sont séparées par min_rest_days jours sans match : chaque équipe peut se reposer
+        if num_teams % 4 or num_teams < 8:
+            raise ValueError("num_teams must be a multiple of 4, at least 8")
+        num_groups = num_teams // 4
+        teams = [f"Team_{i + 1:02d}" for i in range(num_teams)]
+        stadiums = [f"Stadium_{i + 1:02d}" for i in range(num_stadiums)]
+        # Stades répartis de façon reproductible dans un rectangle de la taille de l'Allemagne
+        rng = random.Random(num_stadiums)
+        locations = {stadium: [rng.uniform(47.5, 54.5), rng.uniform(6.0, 14.5)] for stadium in stadiums}
+
+        matches_per_journey = 2 * num_groups
+        window_sizes = [1 + -(-(matches_per_journey - 1) // 3), -(-matches_per_journey // 3), -(-num_groups // 2)]
+        for i in range(extra_days):
+            window_sizes[i % 3] += 1
+        min_rest_days = 2
+        days = [f"Day_{i + 1:02d}" for i in range(sum(window_sizes))]
+        day_numbers = {}
+        journeys = []
+        first_day = 0
+        for journey, size in enumerate(window_sizes, start=1):
+            journeys.append({'days': days[first_day:first_day + size],
+                             'time_slots': ["3pm", "6pm", "9pm"] if journey < 3 else ["6pm", "9pm"]})
+            day_numbers.update((day, first_day + (journey - 1) * min_rest_days + i)
+                               for i, day in enumerate(days[first_day:first_day + size]))
+            first_day += size
+
+        knockout_rounds = generate_knockout_rounds([f"group_{chr(ord('A') + g)}" for g in range(num_groups)])
+        num_knockout_matches = sum(len(knockout_round['matchups']) for knockout_round in knockout_rounds)
+        return cls.from_config({
+            'teams': teams,
+            'pots': {f"Chapeau_{p + 1}": teams[p * num_groups:(p + 1) * num_groups] for p in range(4)},
+            'num_groups': num_groups,
+            'stadiums': locations,
+            'time_slots': ["3pm", "6pm", "9pm"],
+            'days': days,
+            'journeys': journeys,
+            'host_team': teams[0],
+            'opening_match': {'group': 'group_A', 'day': days[0], 'time_slot': "9pm", 'stade': stadiums[0]},
+            'final_stadium': stadiums[0],
+            'min_rest_days': min_rest_days,
+            'day_numbers': day_numbers,
+            'max_knockout_matches_per_stadium': max(2, -(-num_knockout_matches // num_stadiums)),
+            'knockout_rounds': knockout_rounds
+        }, solver_config)
+
+    def build_index(self):
+        # Noyau indexé : codes entiers des équipes, stades, jours et créneaux
+        # (à rappeler si les listes ci-dessus sont modifiées)
+        self.calendar = list(self.days)
+        for knockout_round in self.knockout_rounds:
+            self.calendar.extend(day for day in knockout_round['days'] if day not in self.calendar)
+        self.team_index = {team: i for i, team in enumerate(self.teams)}
+        self.stadium_index = {stadium: i for i, stadium in enumerate(self.stadiums)}
+        self.day_index = {day: i for i, day in enumerate(self.calendar)}
+        self.time_slot_index = {time_slot: i for i, time_slot in enumerate(self.time_slots)}
+        self.group_index = {group_name: i for i, group_name in enumerate(self.groups)}
+        self._third_place_table = None
+        # Tailles dérivées du format : équipes par groupe (une par chapeau), journées, premier match à élimination
+        self.group_size = len(self.chapeaus)
+        self.num_journeys = len(self.journey_days)
+        self.first_knockout_match_id = len(self.groups) * self.group_size * (self.group_size - 1) // 2 + 1
+        # Numéro de chaque jour du calendrier : les écarts entre numéros sont des nombres de jours
+        if self.day_numbers is not None:
+            self.calendar_day_numbers = [self.day_numbers[day] for day in self.calendar]
+        elif all(day_ordinal(day, self.year) is not None for day in self.calendar):
+            self.calendar_day_numbers = [day_ordinal(day, self.year) for day in self.calendar]
+        else:
+            self.calendar_day_numbers = list(range(len(self.calendar)))
+        # Matrice des distances entre stades (km, entiers), indexée par codes de stade
+        self.stadium_distances = [[round(haversine_km(self.stadium_locations[a], self.stadium_locations[b]))
+                                   for b in self.stadiums] for a in self.stadiums]
+        self.set_groups(self.groups)
+
+    def third_place_table(self):
+        # Table des meilleurs troisièmes du premier tour de la phase finale (construite une fois, mise en cache)
+        if self._third_place_table is None:
+            slots = third_place_slots(self.knockout_rounds[0]['matchups'], list(self.groups))
+            self._third_place_table = ThirdPlaceTable.load_or_build(slots, len(self.groups))
+        return self._third_place_table
+
+    def set_groups(self, groups):
+        # Enregistre le tirage et le tableau équipe -> indice de groupe (-1 si non tirée)
+        self.groups.update(groups)
+        self.group_of_team = array.array('b', [-1] * len(self.teams))
+        for group_name, teams in self.groups.items():
+            for team in teams:
+                self.group_of_team[self.team_index[team]] = self.group_index[group_name]
+
+@functools.lru_cache(maxsize=32)
+def round_robin_rounds(group_size):
+    # Journées aller simple d'un groupe selon la méthode du cercle, en indices de position, calculées une fois
+    # par taille de groupe : la position 0 reste fixe, les autres tournent ; une position fictive sert d'exempt
+    # si la taille est impaire. Seuls les ordres de ces journées sont utilisés comme modèles, pas les autres
+    # décompositions en journées (le repli CP-SAT les couvre).
+    n = group_size + group_size % 2
+    rotation = list(range(1, n))
+    base_rounds = []
+    for _ in range(n - 1):
+        circle = [0] + rotation
+        pairs = [tuple(sorted((circle[i], circle[n - 1 - i]))) for i in range(n // 2)]
+        base_rounds.append(tuple(sorted(pair for pair in pairs if pair[1] < group_size)))
+        rotation = rotation[-1:] + rotation[:-1]
+    return tuple(base_rounds)
+
+def template_phases(group, required=()):
+    # Instancie un ordre des journées du cercle compatible avec les matchs imposés (team1, team2, phase), sinon
+    # None. Chaque paire n'appartient qu'à une journée du cercle : un match imposé fixe la journée jouée à sa
+    # phase, les phases libres reçoivent les journées restantes dans l'ordre (le premier ordre compatible
+    # dans l'ordre lexicographique des permutations), sans énumérer les (n - 1)! ordres.
+    index = {team: i for i, team in enumerate(group)}
+    rounds = round_robin_rounds(len(group))
+    round_of_pair = {pair: r for r, pairs in enumerate(rounds) for pair in pairs}
+    order = [None] * len(rounds)
+    for team1, team2, phase in required:
+        r = round_of_pair.get(tuple(sorted((index[team1], index[team2]))))
+        if r is None or not 1 <= phase <= len(rounds) or order[phase - 1] not in (None, r):
+            return None
+        order[phase - 1] = r
+    pinned = [r for r in order if r is not None]
+    if len(set(pinned)) != len(pinned):
+        return None  # Une même journée du cercle imposée à deux phases
+    free = iter(r for r in range(len(rounds)) if r not in pinned)
+    order = [next(free) if r is None else r for r in order]
+    return {p + 1: [(group[i], group[j]) for i, j in rounds[r]] for p, r in enumerate(order)}
+
+def build_journey_model(group, required=()):
+    # Modèle isolé pour un groupe : aucun état partagé, utilisable dans un processus séparé
+    model = cp_model.CpModel()
+    constraints = ConstraintGroups(model)
+    num_teams = len(group)
+    # Aller simple : une journée de moins que d'équipes, une de plus (avec un exempt) si le nombre est impair
+    num_phases = num_teams - 1 + num_teams % 2
+
+    # Variables : match[i][j][p] est True si l'équipe i joue contre l'équipe j dans la phase p
+    match_vars = {}
+    for i in range(num_teams):
+        for j in range(i + 1, num_teams):
+            for p in range(num_phases):
+                match_vars[(group[i], group[j], p)] = model.NewBoolVar(f'match_{group[i]}_{group[j]}_phase_{p}')
+
+    # Chaque équipe joue contre chaque autre équipe exactement une fois dans toutes les phases
+    for i in range(num_teams):
+        for j in range(i + 1, num_teams):
+            constraints.add('each_pair_once', model.Add(sum(match_vars[(group[i], group[j], p)]
+                                                            for p in range(num_phases)) == 1))
+
+    # Chaque équipe joue un match par phase (au plus un si le nombre d'équipes est impair)
+    for p in range(num_phases):
+        for i in range(num_teams):
+            games = sum(match_vars[(group[i], group[j], p)]
+                        if (group[i], group[j], p) in match_vars else match_vars[(group[j], group[i], p)]
+                        for j in range(num_teams) if i != j)
+            constraints.add('one_match_per_journey', model.Add(games <= 1 if num_teams % 2 else games == 1))
+
+    # Matchs imposés à une phase donnée
+    for team1, team2, phase in required:
+        key = (team1, team2, phase - 1) if (team1, team2, phase - 1) in match_vars else (team2, team1, phase - 1)
+        constraints.add(f"pin_{team1}_{team2}_journey_{phase}", model.Add(match_vars[key] == 1))
+    return model, match_vars, constraints
+
+def journey_phases(solver, status, match_vars):
+    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+        phases = {p + 1: [] for p in sorted({p for _, _, p in match_vars})}
+        for (team1, team2, p), var in match_vars.items():
+            if solver.Value(var):
+                phases[p + 1].append((team1, team2))
+        return phases
+    else:
+        print("No feasible solution found.")
+        return None
+
+def oriented_phases(group, phases):
+    # Journées enregistrées (clés JSON en texte) remises dans l'orientation et l'ordre que donnerait un modèle
+    # construit pour ce groupe : paires (i, j) avec i < j dans l'ordre des équipes du groupe
+    index = {team: i for i, team in enumerate(group)}
+    return {int(phase): sorted((tuple(sorted(pair, key=index.get)) for pair in pairs),
+                               key=lambda pair: (index[pair[0]], index[pair[1]]))
+            for phase, pairs in phases.items()}
+
+def solve_group_journey_cp(group, solver_config, required=()):
+    # Repli CP-SAT (point d'entrée des workers), avec les mesures à remonter au processus parent
+    start = time.perf_counter()
+    model, match_vars, constraints = build_journey_model(group, required)
+    build_seconds = time.perf_counter() - start
+    solver = cp_model.CpSolver()
+    solver_config.apply(solver, model)
+    status = solver.Solve(model)
+    metrics = ModelMetrics()
+    metrics.record_model('journey_build', model, build_seconds)
+    metrics.record_solve('journey_solve', solver, status)
+    if status == cp_model.INFEASIBLE:
+        conflict = constraints.explain(solver_config)
+        metrics.conflicts.append({'stage': 'journey_solve', 'constraint_groups': conflict})
+        print(f"Infeasible journey_solve: conflicting constraints: {', '.join(conflict) or 'none identified'}")
+    return journey_phases(solver, status, match_vars), metrics.report()
+
+class DrawCollector(cp_model.CpSolverSolutionCallback):
+    # Transmet chaque tirage énuméré par CP-SAT à on_draw et arrête la recherche une fois la limite atteinte.
+    # Les skip premiers tirages (déjà traités par un appel précédent) sont ignorés
+    def __init__(self, team_group_vars, teams, group_ids, limit, on_draw, skip=0):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.team_group_vars = team_group_vars
+        self.teams = teams
+        self.group_ids = group_ids
+        self.limit = limit
+        self.on_draw = on_draw
+        self.skip = skip
+        self.count = 0
+
+    def on_solution_callback(self):
+        if self.skip:
+            self.skip -= 1
+            return
+        groups = {group_name: [] for group_name in self.group_ids}
+        for team in self.teams:
+            for i, group_name in enumerate(self.group_ids):
+                if self.Value(self.team_group_vars[(team, i)]):
+                    groups[group_name].append(team)
+        self.count += 1
+        self.on_draw(groups)
+        if self.count >= self.limit:
+            self.StopSearch()
+
+class ImprovementReporter(cp_model.CpSolverSolutionCallback):
+    # Signale chaque solution améliorante trouvée pendant l'optimisation (temps, objectif, borne)
+    def __init__(self, on_improvement=None):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.on_improvement = on_improvement
+        self.improvements = []
+
+    def on_solution_callback(self):
+        improvement = {
+            'seconds': self.WallTime(),
+            'objective': self.ObjectiveValue(),
+            'best_objective_bound': self.BestObjectiveBound()
+        }
+        self.improvements.append(improvement)
+        if self.on_improvement:
+            self.on_improvement(improvement)
 
 class MyModel:
-    def __init__(self, data):
+    def __init__(self, data, solver_config=None, group_workers=1, solution_store=None):
         self.data = data
+        self.solver_config = solver_config or data.solver_config
+        # Nombre de processus pour les matchs de groupe (1 = séquentiel, 0 = tous les coeurs) ; le pool est
+        # créé au premier besoin et conservé jusqu'à close()
+        self.group_workers = group_workers
+        self.group_executor = None
+        # Solutions persistantes des sous-problèmes déjà résolus (solution_store.SolutionStore, None = aucune)
+        self.solution_store = solution_store
+        self.format_fingerprints = {}
+        self.reduced_draw = False
+        # Générateur dédié pour rendre les choix aléatoires reproductibles avec random_seed
+        self.rng = random.Random(self.solver_config.random_seed)
         self.model = cp_model.CpModel()
+        self.draw_constraints = ConstraintGroups(self.model)
         self.team_group_vars = {}
         self.match_vars = {}
         self.group_ids = list(self.data.groups.keys())
         self.generated_matches = {}
-
-    def setup_model(self):
+        self.journey_matches = [[] for _ in self.data.journey_days]
+        self.metrics = ModelMetrics()
+        # Phase finale déjà résolue, par jours des derniers matchs de groupe
+        self.knockout_cache = {}
+        # Nombre de tirages déjà énumérés par generate_batch sur ce modèle de tirage
+        self.enumerated_draws = 0
+
+    @timed_stage('draw_build', 'model')
+    def setup_model(self, reduced=False):
+        self.reduced_draw = reduced
+        if reduced:
+            self._setup_reduced_draw()
+            return
         # Variables d'affectation des équipes aux groupes
         for team in self.data.teams:
             for group_id in range(len(self.group_ids)):
                 var_name = f"{team}_in_{self.group_ids[group_id]}"
                 self.team_group_vars[(team, group_id)] = self.model.NewBoolVar(var_name)
 
-        # Contraintes : L'Allemagne dans le groupe A
-        self.model.Add(self.team_group_vars[("Germany", 0)] == 1)  # group_A est 0
+        # Contraintes : L'Allemagne (pays hôte) dans le groupe A
+        constraints = self.draw_constraints
+        opening_group = self.group_ids.index(self.data.opening_match['group'])
+        constraints.add(f"{self.data.host_team}_in_{self.data.opening_match['group']}",
+                        self.model.Add(self.team_group_vars[(self.data.host_team, opening_group)] == 1))
 
         # Chaque équipe dans exactement un groupe
         for team in self.data.teams:
-            self.model.Add(sum(self.team_group_vars[(team, i)] for i in range(len(self.group_ids))) == 1)
+            constraints.add(f"{team}_in_one_group", self.model.Add(
+                sum(self.team_group_vars[(team, i)] for i in range(len(self.group_ids))) == 1))
 
         # Une équipe au maximum par chapeau dans un groupe
         for i, group_name in enumerate(self.group_ids):
             for chapeau, teams in self.data.chapeaus.items():
                 team_vars_in_chapeau = [self.team_group_vars[(team, i)] for team in teams]
-                self.model.AddAtMostOne(team_vars_in_chapeau)
+                constraints.add(f"{chapeau}_limit", self.model.AddAtMostOne(team_vars_in_chapeau))
+
+    def _setup_reduced_draw(self):
+        # Formulation réduite : indice de groupe entier par équipe et AllDifferent par chapeau (chaque chapeau
+        # est une permutation sur les groupes). Les booléens équipe/groupe sont canalisés sur ces indices : ils
+        # portent les contraintes redondantes (une équipe de chaque chapeau et group_size équipes par groupe),
+        # les indications (--hint) et l'extraction du tirage, comme dans la formulation de base.
+        # Symétrie : hormis le groupe du match d'ouverture, les noms de groupes sont interchangeables. Les
+        # groupes sont ordonnés lexicographiquement par leur équipe du chapeau du pays hôte : un seul tirage
+        # par classe de tirages équivalents à un renommage des groupes près (voir count_draws).
+        model = self.model
+        data = self.data
+        constraints = self.draw_constraints
+        num_groups = len(self.group_ids)
+        opening_group = self.group_ids.index(data.opening_match['group'])
+        self.team_group_index_vars = {}
+        for team in data.teams:
+            index = model.NewIntVar(0, num_groups - 1, f"{team}_group")
+            self.team_group_index_vars[team] = index
+            for g, group_name in enumerate(self.group_ids):
+                var = model.NewBoolVar(f"{team}_in_{group_name}")
+                model.Add(index == g).OnlyEnforceIf(var)
+                model.Add(index != g).OnlyEnforceIf(var.Not())
+                self.team_group_vars[(team, g)] = var
+            model.AddExactlyOne(self.team_group_vars[(team, g)] for g in range(num_groups))
+        constraints.add(f"{data.host_team}_in_{data.opening_match['group']}",
+                        model.Add(self.team_group_index_vars[data.host_team] == opening_group))
+
+        for chapeau, teams in data.chapeaus.items():
+            constraints.add(f"{chapeau}_limit",
+                            model.AddAllDifferent(self.team_group_index_vars[team] for team in teams))
+
+        # Contraintes redondantes : renforcent la propagation des booléens canalisés
+        for g in range(num_groups):
+            for chapeau, teams in data.chapeaus.items():
+                constraints.add(f"{chapeau}_limit",
+                                model.AddExactlyOne(self.team_group_vars[(team, g)] for team in teams))
+            constraints.add('group_size', model.Add(sum(self.team_group_vars[(team, g)] for team in data.teams)
+                                                    == len(data.chapeaus)))
+
+        # Rupture de symétrie : les autres équipes du chapeau du pays hôte dans l'ordre croissant des groupes
+        host_pot = next(teams for teams in data.chapeaus.values() if data.host_team in teams)
+        seeds = [self.team_group_index_vars[team] for team in host_pot if team != data.host_team]
+        for seed, next_seed in zip(seeds, seeds[1:]):
+            constraints.add('symmetry_breaking', model.Add(seed < next_seed))
+
+    def _new_solver(self, model):
+        # Solveur configuré selon solver_config (workers, limite de temps, graine, journal, indications)
+        solver = cp_model.CpSolver()
+        self.solver_config.apply(solver, model)
+        return solver
+
+    def add_stage_hook(self, hook):
+        # hook(étape, 'start' | 'end', infos) est appelé autour de chaque étape chronométrée
+        self.metrics.hooks.append(hook)
+
+    def _solve(self, stage, model, callback=None, constraint_groups=None, **parameters):
+        # Résolution chronométrée ; parameters surcharge les paramètres du solveur pour cet appel.
+        # Modèle infaisable : les groupes de contraintes en conflit (constraint_groups) sont recherchés par
+        # une résolution supplémentaire, affichés et enregistrés dans les métriques
+        solver = self._new_solver(model)
+        for name, value in parameters.items():
+            setattr(solver.parameters, name, value)
+        with self.metrics.stage(stage):
+            status = solver.Solve(model, callback)
+        self.metrics.record_solve(stage, solver, status, model.HasObjective())
+        if status == cp_model.INFEASIBLE and constraint_groups is not None:
+            self.explain_infeasibility(stage, constraint_groups)
+        return solver, status
+
+    def explain_infeasibility(self, stage, constraint_groups):
+        with self.metrics.stage(f'{stage}_explain'):
+            conflict = constraint_groups.explain(self.solver_config)
+        self.metrics.conflicts.append({'stage': stage, 'constraint_groups': conflict})
+        print(f"Infeasible {stage}: conflicting constraints: {', '.join(conflict) or 'none identified'}")
+        return conflict
+
+    def close(self):
+        # Arrêt du pool de processus des matchs de groupe
+        if self.group_executor is not None:
+            self.group_executor.shutdown()
+            self.group_executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _stored_solution(self, stage, key):
+        # Solution enregistrée d'un modèle de même forme canonique (réponse directe, sans résolution)
+        if self.solution_store is None:
+            return None
+        solution = self.solution_store.lookup(stage, key)
+        self.metrics.count(f'{stage}_store_hits' if solution is not None else f'{stage}_store_misses')
+        return solution
+
+    def _hint_from_store(self, stage, family, model, hints=None):
+        # Modèle voisin déjà résolu (même famille) : sa solution sert d'indications, sans écraser celles de --hint
+        if self.solution_store is None:
+            return
+        solution = self.solution_store.nearest(stage, family)
+        if solution is None:
+            return
+        hints = hints(solution) if hints else solution.get('hints', {})
+        add_named_hints(model, {name: value for name, value in hints.items() if name not in self.solver_config.hints})
+        self.metrics.count(f'{stage}_store_hinted')
+
+    def _save_solution(self, stage, key, solution, family=None, solver=None, model=None):
+        if self.solution_store is None:
+            return
+        if solver is not None:
+            # Valeurs non nulles seulement : suffisent comme indications et gardent les entrées compactes
+            solution['hints'] = {name: value for name, value in solution_store.solution_values(solver, model).items()
+                                 if value}
+        self.solution_store.save(stage, key, solution, family)
+
+    def _format_fingerprint(self, *exclude):
+        # Empreinte du format du tournoi, indépendante de l'ordre des équipes et des noms de chapeaux
+        # (calculée une fois : elle entre dans la clé de chaque placement)
+        if exclude not in self.format_fingerprints:
+            config = self.data.to_config()
+            del config['teams']
+            config['pots'] = solution_store.canonical_pots(self.data.chapeaus)
+            for name in exclude:
+                config.pop(name, None)
+            self.format_fingerprints[exclude] = solution_store.fingerprint('format', config)
+        return self.format_fingerprints[exclude]
+
+    def _draw_fingerprint(self):
+        # Forme canonique du modèle de tirage ; la famille (mêmes groupes et pays hôte) ignore les équipes
+        data = self.data
+        family = {'groups': self.group_ids, 'host_team': data.host_team, 'opening_group': data.opening_match['group'],
+                  'num_pots': len(data.chapeaus), 'reduced': self.reduced_draw}
+        key = dict(family, pots=solution_store.canonical_pots(data.chapeaus), seed=self.solver_config.random_seed,
+                   hints=sorted(self.solver_config.hints.items()),
+                   constraint_groups=sorted(self.draw_constraints.literals),
+                   num_constraints=len(self.model.Proto().constraints))
+        return key, family
+
+    def _journey_fingerprint(self, group, required):
+        family = {'teams': sorted(group)}
+        key = dict(family, required=sorted([sorted((team1, team2)), phase] for team1, team2, phase in required),
+                   seed=self.solver_config.random_seed)
+        return key, family
 
     def solve(self):
-        # Résolution du modèle
-        solver = cp_model.CpSolver()
-        status = solver.Solve(self.model)
+        # Résolution du modèle (ou tirage enregistré pour le même modèle, équipes dans l'ordre de data.teams)
+        key, family = self._draw_fingerprint()
+        stored = self._stored_solution('draw', key)
+        if stored is not None:
+            group_of = {team: group_name for group_name, teams in stored['groups'].items() for team in teams}
+            groups = {group_name: [] for group_name in self.group_ids}
+            for team in self.data.teams:
+                groups[group_of[team]].append(team)
+            return groups
+        self._hint_from_store('draw', family, self.model)
+        solver, status = self._solve('draw_solve', self.model, constraint_groups=self.draw_constraints)
         if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
             groups = {group_name: [] for group_name in self.group_ids}
             for team in self.data.teams:
                 for i, group_name in enumerate(self.group_ids):
                     if solver.Value(self.team_group_vars[(team, i)]):
                         groups[group_name].append(team)
+            self._save_solution('draw', key, {'groups': groups}, family, solver, self.model)
             return groups
         else:
             print("No feasible solution found.")
             return None
 
-    def setup_model_journey(self, group):
+    @timed_stage('journey_build', 'model_journey')
+    def setup_model_journey(self, group, required=()):
         # Initialisation du modèle pour un groupe
-        self.model_journey = cp_model.CpModel()
         self.matches = []
-        num_teams = len(group)
-        num_phases = 3
-
-        # Variables : match[i][j][p] est True si l'équipe i joue contre l'équipe j dans la phase p
-        self.match_vars = {}
-        for i in range(num_teams):
-            for j in range(i + 1, num_teams):
-                for p in range(num_phases):
-                    var = self.model_journey.NewBoolVar(f'match_{group[i]}_{group[j]}_phase_{p}')
-                    self.match_vars[(group[i], group[j], p)] = var
-
-        # Chaque équipe joue contre chaque autre équipe exactement une fois dans toutes les phases
-        for i in range(num_teams):
-            for j in range(i + 1, num_teams):
-                self.model_journey.Add(sum(self.match_vars[(group[i], group[j], p)] for p in range(num_phases)) == 1)
-
-        # Chaque équipe joue un match par phase
-        for p in range(num_phases):
-            for i in range(num_teams):
-                self.model_journey.Add(sum(self.match_vars[(group[i], group[j], p)]
-                                           if (group[i], group[j], p) in self.match_vars else self.match_vars[
-                    (group[j], group[i], p)]
-                                           for j in range(num_teams) if i != j) == 1)
+        self.journey_group = list(group)
+        self.journey_required = tuple(required)
+        self.model_journey, self.match_vars, self.journey_constraints = build_journey_model(group, required)
 
     def solve_model_journey(self):
-        # Résolution du modèle de phase de groupe
-        solver = cp_model.CpSolver()
-        status = solver.Solve(self.model_journey)
-        if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-            phases = {1: [], 2: [], 3: []}
-            for (team1, team2, p), var in self.match_vars.items():
-                if solver.Value(var):
-                    phases[p + 1].append((team1, team2))
-            return phases
+        # Résolution du modèle de phase de groupe (ou journées enregistrées pour le même groupe et les mêmes
+        # matchs imposés)
+        key, family = self._journey_fingerprint(self.journey_group, self.journey_required)
+        stored = self._stored_solution('journey', key)
+        if stored is not None:
+            return oriented_phases(self.journey_group, stored['phases'])
+        self._hint_from_store('journey', family, self.model_journey, lambda solution: {
+            f'match_{team1}_{team2}_phase_{phase - 1}': 1
+            for phase, matches in oriented_phases(self.journey_group, solution['phases']).items()
+            for team1, team2 in matches})
+        solver, status = self._solve('journey_solve', self.model_journey, constraint_groups=self.journey_constraints)
+        phases = journey_phases(solver, status, self.match_vars)
+        if phases:
+            self._save_solution('journey', key, {'phases': phases}, family)
+        return phases
+
+    def generate_group_matches(self, groups, fixture_pins=None):
+        # Matchs de chaque groupe, résolus indépendamment (en parallèle si group_workers != 1).
+        # fixture_pins : nom du groupe -> matchs imposés (team1, team2, phase)
+        fixture_pins = fixture_pins or {}
+        # Groupes avec matchs imposés déjà résolus par CP-SAT lors d'une exécution précédente (les autres
+        # groupes sont instanciés depuis les journées du cercle, sans résolution)
+        stored = {}
+        for group_name in groups:
+            if fixture_pins.get(group_name):
+                solution = self._stored_solution('journey', self._journey_fingerprint(
+                    groups[group_name], fixture_pins[group_name])[0])
+                if solution is not None:
+                    stored[group_name] = oriented_phases(groups[group_name], solution['phases'])
+        # Journées du cercle instanciées ici (quelques microsecondes) : seuls les groupes dont les matchs imposés
+        # n'entrent dans aucun ordre de ces journées sont confiés à CP-SAT, et au pool de processus
+        instantiated = {}
+        for group_name in groups:
+            if group_name not in stored:
+                phases = template_phases(groups[group_name], fixture_pins.get(group_name, ()))
+                if phases is not None:
+                    instantiated[group_name] = phases
+                    self.metrics.count('journey_templates_used')
+        group_names = [group_name for group_name in groups
+                       if group_name not in stored and group_name not in instantiated]
+        group_teams = [groups[group_name] for group_name in group_names]
+        group_pins = [tuple(fixture_pins.get(group_name, ())) for group_name in group_names]
+        if not group_names:
+            results = []
+        elif self.group_workers == 1 or len(group_names) <= 1:
+            results = [solve_group_journey_cp(teams, self.solver_config, pins)
+                       for teams, pins in zip(group_teams, group_pins)]
         else:
-            print("No feasible solution found.")
-            return None
-
-    def setup_model2(self, groups):
-        self.matches_journey_1 = []
-        self.matches_journey_2 = []
-        self.matches_journey_3 = []
+            # Un seul worker CP-SAT par processus pour ne pas surcharger les coeurs
+            config = copy.copy(self.solver_config)
+            if not config.num_search_workers:
+                config.num_search_workers = 1
+            if self.group_executor is None:
+                self.group_executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.group_workers or None)
+            # map conserve l'ordre des groupes : fusion déterministe
+            results = list(self.group_executor.map(solve_group_journey_cp, group_teams,
+                                                   [config] * len(group_teams), group_pins))
+        for (phases, stats), teams, pins in zip(results, group_teams, group_pins):
+            self.metrics.count('journey_cp_fallbacks')
+            self.metrics.models.extend(stats['models'])
+            self.metrics.solves.extend(stats['solves'])
+            self.metrics.conflicts.extend(stats['conflicts'])
+            if phases:
+                key, family = self._journey_fingerprint(teams, pins)
+                self._save_solution('journey', key, {'phases': phases}, family)
+        solved = dict(zip(group_names, [phases for phases, _ in results]))
+        solved.update(stored)
+        solved.update(instantiated)
+        return {group_name: solved[group_name] for group_name in groups}
+
+    @timed_stage('placement')
+    def setup_model2(self, groups, fixture_pins=None, group_matches=None):
+        # Placement glouton sur le noyau indexé : codes entiers, occupation des stades en bitset par jour.
+        # group_matches : résultat de generate_group_matches s'il a déjà été calculé (chronométrage séparé)
+        self.journey_matches = [[] for _ in self.data.journey_days]
+        self.stadium_choices = []  # Nombre de stades candidats de chaque tirage aléatoire
 
         self.generated_matches = {}
 
         # Générer tous les matchs une fois et les stocker en utilisant le modèle de contrainte
-        for group_name, teams in groups.items():
-            self.setup_model_journey(teams)
-            group_phases = self.solve_model_journey()
+        if group_matches is None:
+            group_matches = self.generate_group_matches(groups, fixture_pins)
+        for group_name, group_phases in group_matches.items():
             if group_phases:
                 self.generated_matches[group_name] = group_phases
             else:
                 print(f"Failed to create matches for {group_name}")
                 return
 
+        data = self.data
+        data.set_groups(groups)
+        host = data.host_team
+        opening = data.opening_match
+
+        # Groupes de taille impaire : si le pays hôte est exempté lors de la phase 1, échanger celle-ci avec la
+        # première phase où il joue (l'ordre des phases est libre sauf matchs imposés dans ce groupe)
+        opening_phases = self.generated_matches[opening['group']]
+        if not (fixture_pins or {}).get(opening['group']) and not any(host in match for match in opening_phases[1]):
+            phase = next(phase for phase, matches in opening_phases.items() if any(host in match for match in matches))
+            opening_phases[1], opening_phases[phase] = opening_phases[phase], opening_phases[1]
+
         # Premier match de la phase 1
         opening_match_opponent = None
-        for match in self.generated_matches["group_A"][1]:
-            if "Germany" in match:
-                opening_match_opponent = match[1] if match[0] == "Germany" else match[0]
+        for match in self.generated_matches[opening['group']][1]:
+            if host in match:
+                opening_match_opponent = match[1] if match[0] == host else match[0]
                 break
-
-        opening_match = ("Germany", opening_match_opponent, "Friday_14_06", "9pm", "Allianz_Arena")
-        self.matches_journey_1.append(opening_match)
+        if opening_match_opponent is None:
+            print(f"Failed to create the opening match: {host} does not play in group_journey_1")
+            return
+
+        # Placement enregistré pour les mêmes matchs de groupe et le même état du générateur aléatoire : il
+        # est rejoué tel quel, et le générateur avancé des mêmes tirages (choice ne dépend que de la longueur)
+        key = {
+            'format': self._format_fingerprint(),
+            'phases': {group_name: {phase: sorted(sorted(match) for match in matches)
+                                    for phase, matches in group_phases.items()}
+                       for group_name, group_phases in sorted(self.generated_matches.items())},
+            'rng': hashlib.sha256(array.array('I', self.rng.getstate()[1]).tobytes()).hexdigest()
+        }
+        stored = self._stored_solution('placement', key)
+        if stored is not None:
+            self.journey_matches = [[Match(data.team_index[team1], data.team_index[team2], data.day_index[day],
+                                           data.time_slot_index[time_slot], data.stadium_index[stadium])
+                                     for team1, team2, day, time_slot, stadium in matches]
+                                    for matches in stored['journeys']]
+            for num_choices in stored['stadium_choices']:
+                self.rng.choice(range(num_choices))
+            return
+
+        opening_match = Match(data.team_index[host], data.team_index[opening_match_opponent],
+                              data.day_index[opening['day']], data.time_slot_index[opening['time_slot']],
+                              data.stadium_index[opening['stade']])
+        self.journey_matches[0].append(opening_match)
 
         # Retirer le match d'ouverture des matchs de la phase 1 du groupe A
-        self.generated_matches["group_A"][1] = [match for match in self.generated_matches["group_A"][1] if
-                                                "Germany" not in match]
-
-        # Commencer la planification pour la phase 1 à partir du deuxième jour
-        time_index = 0
-        days = self.data.days[1:]
-        used_stadiums = {day: [] for day in days}  # Suivre les stades utilisés chaque jour
-
-        # Planifier les matchs dans l'ordre des groupes pour la phase 1
-        for group_name in self.group_ids:
-            matches = self.generated_matches[group_name][1]  # matchs de la phase 1
-            for match in matches:
-                day = days[time_index // len(self.data.time_slots)]
-                time_slot = self.data.time_slots[time_index % len(self.data.time_slots)]
-
-                # Sélectionner un stade non utilisé ce jour-là
-                available_stadiums = [stadium for stadium in self.data.stadiums if stadium not in used_stadiums[day]]
-                if not available_stadiums:
-                    continue  # Si aucun stade disponible, passer à la prochaine combinaison
-                stadium = random.choice(available_stadiums)
-                used_stadiums[day].append(stadium)
-
-                match_var = (match[0], match[1], day, time_slot, stadium)
-                self.matches_journey_1.append(match_var)
-
-                time_index += 1
-
-        # Assurer l'absence de doublons pour la phase 1
-        used_teams = set()
-        final_matches = []
-        for match in self.matches_journey_1:
-            if (match[0], match[1]) not in used_teams and (match[1], match[0]) not in used_teams:
-                final_matches.append(match)
-                used_teams.add((match[0], match[1]))
-                used_teams.add((match[1], match[0]))
-
-        self.matches_journey_1 = final_matches
-
-        # Commencer la planification pour la phase 2
+        self.generated_matches[opening['group']][1] = [match for match in self.generated_matches[opening['group']][1]
+                                                       if host not in match]
+
+        # Chaque journée dans sa propre fenêtre, le jour d'ouverture étant réservé au match d'ouverture (matchs
+        # simultanés par groupe lors de la dernière journée, si le format le prévoit). Un match qui ne trouve
+        # pas de place dans sa fenêtre fait échouer le placement plutôt que de produire un calendrier invalide
+        skipped = 0
+        for journey, days in data.journey_days.items():
+            window = [data.day_index[day] for day in days if day != opening['day']]
+            slot_per_group = journey == data.num_journeys and data.simultaneous_last_journey
+            skipped += self._place_journey(journey, window, data.journey_time_slots[journey], slot_per_group)
+        if skipped:
+            print(f"Failed to place {skipped} group matches within their matchday windows")
+            self.journey_matches = [[] for _ in data.journey_days]
+            return
+        self._save_solution('placement', key, {'journeys': self.journeys, 'stadium_choices': self.stadium_choices})
+
+    def _place_journey(self, journey, window, time_slots, slot_per_group):
+        # Placement glouton d'une journée sur les jours de window ; renvoie le nombre de matchs non placés
+        data = self.data
+        team_index = data.team_index
+        slots = [data.time_slot_index[time_slot] for time_slot in time_slots]
+        num_stadiums = len(data.stadiums)
+        matches = self.journey_matches[journey - 1]
         time_index = 0
-        days = self.data.days[5:]  # Commencer à partir de Tuesday_18_06
-        used_stadiums = {day: [] for day in days}  # Suivre les stades utilisés chaque jour
+        skipped = 0
+        used_stadiums = [0] * len(data.calendar)  # Bitset des stades utilisés chaque jour
 
         for group_name in self.group_ids:
-            matches = self.generated_matches[group_name][2]  # matchs de la phase 2
-            used_teams = set()
-            for match in matches:
-                if match[0] in used_teams or match[1] in used_teams:
+            used_teams = 0  # Bitset des équipes déjà placées dans ce groupe
+            for team1, team2 in self.generated_matches[group_name][journey]:
+                t1 = team_index[team1]
+                t2 = team_index[team2]
+                if used_teams >> t1 & 1 or used_teams >> t2 & 1:
+                    self.metrics.count(f'placement_journey_{journey}_skipped_team_already_placed')
+                    skipped += 1
                     continue
 
-                day = days[time_index // len(self.data.time_slots)]
-                time_slot = self.data.time_slots[time_index % len(self.data.time_slots)]
+                if time_index // len(slots) >= len(window):
+                    self.metrics.count(f'placement_journey_{journey}_skipped_no_day')
+                    skipped += 1
+                    continue  # Au-delà du dernier jour de la fenêtre de la journée
+                day = window[time_index // len(slots)]
+                time_slot = slots[time_index % len(slots)]
 
                 # Sélectionner un stade non utilisé ce jour-là
-                available_stadiums = [stadium for stadium in self.data.stadiums if stadium not in used_stadiums[day]]
+                occupied = used_stadiums[day]
+                available_stadiums = [stadium for stadium in range(num_stadiums) if not occupied >> stadium & 1]
                 if not available_stadiums:
+                    self.metrics.count(f'placement_journey_{journey}_skipped_no_stadium')
+                    skipped += 1
                     continue  # Si aucun stade disponible, passer à la prochaine combinaison
-                stadium = random.choice(available_stadiums)
-                used_stadiums[day].append(stadium)
+                stadium = self.rng.choice(available_stadiums)
+                self.stadium_choices.append(len(available_stadiums))
+                used_stadiums[day] = occupied | 1 << stadium
 
-                match_var = (match[0], match[1], day, time_slot, stadium)
-                self.matches_journey_2.append(match_var)
+                matches.append(Match(t1, t2, day, time_slot, stadium))
+                used_teams |= 1 << t1 | 1 << t2
+                if not slot_per_group:
+                    time_index += 1
 
-                time_index += 1
-                used_teams.add(match[0])
-                used_teams.add(match[1])
+            if slot_per_group:
+                time_index += 1  # Augmenter l'index de temps uniquement après avoir planifié les matchs du groupe
 
-        # Assurer l'absence de doublons pour la phase 2
-        used_teams = set()
+        # Assurer l'absence de doublons (paires codées en un entier)
+        num_teams = len(data.teams)
+        used_pairs = set()
         final_matches = []
-        for match in self.matches_journey_2:
-            if (match[0], match[1]) not in used_teams and (match[1], match[0]) not in used_teams:
+        for match in matches:
+            pair = min(match.team1, match.team2) * num_teams + max(match.team1, match.team2)
+            if pair not in used_pairs:
                 final_matches.append(match)
-                used_teams.add((match[0], match[1]))
-                used_teams.add((match[1], match[0]))
-
-        self.matches_journey_2 = final_matches
+                used_pairs.add(pair)
+        self.metrics.count(f'placement_journey_{journey}_duplicates_removed', len(matches) - len(final_matches))
+        self.journey_matches[journey - 1] = final_matches
+        return skipped
 
-        # Commencer la planification pour la phase 3
-        time_index = 0
-        days = self.data.days[9:]  # Commencer à partir de Sunday_23_06
-        used_stadiums = {day: [] for day in days}  # Suivre les stades utilisés chaque jour
+    # Les noms ne sont résolus qu'à la sortie, à partir des enregistrements indexés
+    @property
+    def journeys(self):
+        return [[match.names(self.data) for match in matches] for matches in self.journey_matches]
 
-        for group_name in self.group_ids:
-            matches = self.generated_matches[group_name][3]  # matchs de la phase 3
-            used_teams = set()
+    def solve2(self):
+        # Calendrier des journées produit par setup_model2. Le tirage est déjà fixé : le modèle de tirage n'est
+        # pas résolu une seconde fois
+        if self.journey_matches and self.journey_matches[-1]:
+            return self.journeys
+        print("No feasible solution found.")
+        return None
+
+    def schedule_cost(self, journey_matches=None):
+        # Distance parcourue par les équipes entre deux matchs consécutifs (km) et jours de repos manquants
+        data = self.data
+        journey_matches = self.journey_matches if journey_matches is None else journey_matches
+        team_matches = {}
+        for matches in journey_matches:
             for match in matches:
-                if match[0] in used_teams or match[1] in used_teams:
-                    continue
-
-                day = days[time_index // 2]
-                time_slot = "6pm" if time_index % 2 == 0 else "9pm"
-
-                # Sélectionner un stade non utilisé ce jour-là
-                available_stadiums = [stadium for stadium in self.data.stadiums if stadium not in used_stadiums[day]]
-                if not available_stadiums:
-                    continue  # Si aucun stade disponible, passer à la prochaine combinaison
-                stadium = random.choice(available_stadiums)
-                used_stadiums[day].append(stadium)
-
-                match_var = (match[0], match[1], day, time_slot, stadium)
-                self.matches_journey_3.append(match_var)
-
-                used_teams.add(match[0])
-                used_teams.add(match[1])
-
-            time_index += 1  # Augmenter l'index de temps uniquement après avoir planifié deux matchs pour chaque groupe
-
-        # Assurer l'absence de doublons pour la phase 3
-        used_teams = set()
-        final_matches = []
-        for match in self.matches_journey_3:
-            if (match[0], match[1]) not in used_teams and (match[1], match[0]) not in used_teams:
-                final_matches.append(match)
-                used_teams.add((match[0], match[1]))
-                used_teams.add((match[1], match[0]))
+                team_matches.setdefault(match.team1, []).append(match)
+                team_matches.setdefault(match.team2, []).append(match)
+        travel = 0
+        missing_rest = 0
+        for matches in team_matches.values():
+            matches.sort(key=lambda match: (match.day, match.time_slot))
+            for previous, match in zip(matches, matches[1:]):
+                travel += data.stadium_distances[previous.stadium][match.stadium]
+                gap = data.calendar_day_numbers[match.day] - data.calendar_day_numbers[previous.day]
+                missing_rest += max(0, data.min_rest_days + 1 - gap)
+        return travel, missing_rest
+
+    @timed_stage('optimization_build', 'optimization_model')
+    def setup_optimization_model(self):
+        # Optimisation du calendrier de groupes produit par setup_model2 : tirage et rencontres de chaque journée
+        # restent fixés, créneaux et stades sont choisis pour minimiser la distance parcourue par les équipes
+        # (km) en respectant les jours de repos. Le calendrier glouton sert de point de départ.
+        self.optimization_model = cp_model.CpModel()
+        model = self.optimization_model
+        constraints = self.optimization_constraints = ConstraintGroups(model)
+        data = self.data
+        opening = data.opening_match
+        opening_day = data.day_index[opening['day']]
+        opening_slot = (opening_day, data.time_slot_index[opening['time_slot']])
+        opening_stadium = data.stadium_index[opening['stade']]
+        num_stadiums = len(data.stadiums)
+        num_journeys = len(self.journey_matches)
+        self.optimization_matches = []  # (journée, match glouton, créneaux possibles, stades possibles)
+        self.optimization_slot_vars = {}
+        self.optimization_stadium_vars = {}
+        group_slot_vars = {}
+        slot_usage = {}
+        stadium_usage = {}
+        team_schedule = {}
+        hints = {}
+
+        for journey, matches in enumerate(self.journey_matches, start=1):
+            for match in matches:
+                m = len(self.optimization_matches)
+                if (match.day, match.time_slot) == opening_slot:
+                    options = [opening_slot]
+                    stadiums = [opening_stadium]
+                else:
+                    # Le jour d'ouverture n'accueille que le match d'ouverture
+                    options = [(data.day_index[day], data.time_slot_index[time_slot])
+                               for day in data.journey_days[journey]
+                               for time_slot in data.journey_time_slots[journey] if data.day_index[day] != opening_day]
+                    stadiums = list(range(num_stadiums))
+                self.optimization_matches.append((journey, match, options, stadiums))
+
+                # Créneau : les deux matchs d'un groupe lors de la dernière journée partagent le même
+                group = data.group_of_team[match.team1]
+                for option in options:
+                    if journey == num_journeys and data.simultaneous_last_journey:
+                        key = (group, option)
+                        if key not in group_slot_vars:
+                            group_slot_vars[key] = model.NewBoolVar(f"group_{group}_last_{option[0]}_{option[1]}")
+                            slot_usage.setdefault(option, []).append(group_slot_vars[key])
+                        var = group_slot_vars[key]
+                    else:
+                        var = model.NewBoolVar(f"match_{m}_{option[0]}_{option[1]}")
+                        slot_usage.setdefault(option, []).append(var)
+                    self.optimization_slot_vars[(m, option)] = var
+                    hints[var.Index()] = (var, option == (match.day, match.time_slot))
+                constraints.add('journey_windows', model.AddExactlyOne(
+                    self.optimization_slot_vars[(m, option)] for option in options))
+
+                # Stade
+                for stadium in stadiums:
+                    var = model.NewBoolVar(f"match_{m}_at_{stadium}")
+                    self.optimization_stadium_vars[(m, stadium)] = var
+                    hints[var.Index()] = (var, stadium == match.stadium)
+                venue = 'opening_match' if (match.day, match.time_slot) == opening_slot else 'match_stadiums'
+                constraints.add(venue, model.AddExactlyOne(
+                    self.optimization_stadium_vars[(m, stadium)] for stadium in stadiums))
+
+                # Un stade accueille au plus un match par jour
+                day_vars = {}
+                for option in options:
+                    day_vars.setdefault(option[0], []).append(self.optimization_slot_vars[(m, option)])
+                for day, slot_vars in day_vars.items():
+                    for stadium in stadiums:
+                        used = model.NewBoolVar(f"match_{m}_{day}_at_{stadium}")
+                        model.Add(used >= sum(slot_vars) + self.optimization_stadium_vars[(m, stadium)] - 1)
+                        hints[used.Index()] = (used, day == match.day and stadium == match.stadium)
+                        stadium_usage.setdefault((day, stadium), []).append(used)
+
+                # Jour (numéro réel du calendrier, pour les jours de repos) et stade (pour les distances)
+                # sous forme entière
+                day_numbers = [data.calendar_day_numbers[option[0]] for option in options]
+                day = model.NewIntVar(min(day_numbers), max(day_numbers), f"match_{m}_day")
+                model.Add(day == sum(number * self.optimization_slot_vars[(m, option)]
+                                     for number, option in zip(day_numbers, options)))
+                stadium_code = model.NewIntVar(min(stadiums), max(stadiums), f"match_{m}_stadium")
+                model.Add(stadium_code == sum(stadium * self.optimization_stadium_vars[(m, stadium)]
+                                              for stadium in stadiums))
+                hints[day.Index()] = (day, data.calendar_day_numbers[match.day])
+                hints[stadium_code.Index()] = (stadium_code, match.stadium)
+                team_schedule.setdefault(match.team1, []).append((day, stadium_code, match))
+                team_schedule.setdefault(match.team2, []).append((day, stadium_code, match))
+
+        for slot_vars in slot_usage.values():
+            constraints.add('one_match_per_slot', model.AddAtMostOne(slot_vars))
+        for used_vars in stadium_usage.values():
+            constraints.add('one_match_per_stadium_per_day', model.AddAtMostOne(used_vars))
+
+        # Chaque enchaînement de deux matchs d'une équipe respecte les jours de repos ; son coût est la distance
+        # entre les stades (table aplatie indexée par stade1 * nombre de stades + stade2)
+        distances = [distance for row in data.stadium_distances for distance in row]
+        travel_terms = []
+        for team, schedule in team_schedule.items():
+            for k, ((day1, stadium1, match1), (day2, stadium2, match2)) in enumerate(zip(schedule, schedule[1:])):
+                pair = model.NewIntVar(0, len(distances) - 1, f"team_{team}_move_{k}")
+                model.Add(pair == stadium1 * num_stadiums + stadium2)
+                travel = model.NewIntVar(0, max(distances), f"team_{team}_travel_{k}")
+                model.AddElement(pair, distances, travel)
+                constraints.add('group_rest_days', model.Add(day2 - day1 >= data.min_rest_days + 1))
+                hints[pair.Index()] = (pair, match1.stadium * num_stadiums + match2.stadium)
+                hints[travel.Index()] = (travel, data.stadium_distances[match1.stadium][match2.stadium])
+                travel_terms.append(travel)
+        model.Minimize(sum(travel_terms))
+
+        # Démarrage à chaud : la solution du placement glouton, complète, est donnée en indication
+        for var, value in hints.values():
+            model.AddHint(var, int(value))
+
+    def optimize_schedule(self, max_time_in_seconds=10.0, on_improvement=None):
+        # Résolution dans le budget de temps ; chaque solution améliorante est transmise à on_improvement.
+        # self.journey_matches est remplacé par la meilleure solution trouvée.
+        if self.solver_config.max_time_in_seconds is not None:
+            max_time_in_seconds = min(max_time_in_seconds, self.solver_config.max_time_in_seconds)
+        before = self.schedule_cost()
+        reporter = ImprovementReporter(on_improvement)
+        # Sans sondage ni détection de symétries au prétraitement : la solution indiquée est retrouvée
+        # immédiatement au lieu d'après plusieurs secondes, et le budget profite à la recherche
+        solver, status = self._solve('optimization_solve', self.optimization_model, reporter,
+                                     constraint_groups=self.optimization_constraints,
+                                     max_time_in_seconds=max_time_in_seconds, cp_model_probing_level=0,
+                                     symmetry_level=0)
+        if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+            journey_matches = [[] for _ in self.journey_matches]
+            for m, (journey, match, options, stadiums) in enumerate(self.optimization_matches):
+                day, time_slot = next(option for option in options
+                                      if solver.Value(self.optimization_slot_vars[(m, option)]))
+                stadium = next(stadium for stadium in stadiums
+                               if solver.Value(self.optimization_stadium_vars[(m, stadium)]))
+                journey_matches[journey - 1].append(Match(match.team1, match.team2, day, time_slot, stadium))
+            for matches in journey_matches:
+                matches.sort(key=lambda match: (match.day, match.time_slot))
+            self.journey_matches = journey_matches
+        else:
+            print("No feasible solution found.")
+        travel, missing_rest = self.schedule_cost()
+        return {
+            'status': solver.StatusName(status),
+            'before': {'travel_km': before[0], 'missing_rest_days': before[1]},
+            'after': {'travel_km': travel, 'missing_rest_days': missing_rest},
+            'improvements': reporter.improvements
+        }
 
-        self.matches_journey_3 = final_matches
+    @timed_stage('batch')
+    def generate_batch(self, num_schedules, output_path, schedules_per_draw=1, progress_every=1000,
+                       output_format="jsonl", validate=False, reduced_draw=False):
+        # Génération en lot : tirages distincts énumérés par CP-SAT, calendriers écrits au fil de l'eau
+        # (JSON Lines ou enregistrements binaires, voir schedule_export). validate : chaque calendrier est
+        # vérifié (schedule_validator) et les violations sont comptées par règle dans les métriques.
+        # reduced_draw : énumération des seuls tirages canoniques (formulation réduite du tirage).
+        # Les tirages sont énumérés en une seule recherche et traités directement dans le callback : seul le
+        # tirage courant est en mémoire. L'énumération (un seul worker, même graine) est déterministe : un appel
+        # suivant saute les enumerated_draws premiers tirages au lieu d'ajouter une contrainte de blocage par
+        # tirage, et la mémoire ne croît pas avec le nombre de tirages.
+        if not self.team_group_vars:
+            self.setup_model(reduced_draw)
+        num_draws = -(-num_schedules // schedules_per_draw)
+        written = 0
+        invalid = 0
+        validator = schedule_validator.ScheduleValidator(self.data) if validate else None
+        start = time.perf_counter()
+        if output_format == "binary":
+            writer = schedule_export.ScheduleWriter(output_path, schedule_export.Vocabulary.from_data(self.data))
+        else:
+            writer = schedule_export.JsonLinesWriter(output_path)
+
+        def write_draw(groups):
+            nonlocal written, invalid
+            for _ in range(schedules_per_draw):
+                if written >= num_schedules:
+                    break
+                self.setup_model2(groups)
+                if not self.journey_matches[-1]:
+                    continue
+                knockout_matches = self.schedule_knockout_phase(self.data)
+                if not knockout_matches:
+                    continue
+                if validator:
+                    violations = validator.validate_indexed(self.journey_matches, knockout_matches)
+                    for rule, count in schedule_validator.count_by_rule(violations).items():
+                        self.metrics.count(f'validation_{rule}', count)
+                    invalid += not schedule_validator.is_valid(violations)
+                writer.write_indexed(written, groups, self.journey_matches, knockout_matches, self.data)
+                written += 1
+                if progress_every and written % progress_every == 0:
+                    elapsed = time.perf_counter() - start
+                    print(f"{written} schedules - {written / elapsed:.1f} schedules/sec")
+
+        with writer:
+            collector = DrawCollector(self.team_group_vars, self.data.teams, self.group_ids, num_draws, write_draw,
+                                      skip=self.enumerated_draws)
+            # Un seul worker : requis pour l'énumération
+            self._solve('batch_enumeration', self.model, collector, enumerate_all_solutions=True,
+                        num_search_workers=1)
+        self.enumerated_draws += collector.count
+
+        elapsed = time.perf_counter() - start
+        return {
+            'draws': collector.count,
+            'schedules': written,
+            'invalid': invalid,
+            'seconds': elapsed,
+            'schedules_per_sec': written / elapsed if elapsed else 0.0
+        }
 
-    def solve2(self):
-        # Résolution du modèle global
-        solver = cp_model.CpSolver()
-        status = solver.Solve(self.model)
+    @timed_stage('unified_build', 'unified_model')
+    def setup_unified_model(self):
+        # Modèle unique : tirage des groupes, journées, créneaux, stades et phase finale
+        self.unified_model = cp_model.CpModel()
+        model = self.unified_model
+        constraints = self.unified_constraints = ConstraintGroups(model)
+        data = self.data
+        chapeaus = list(data.chapeaus.values())
+        group_size = len(chapeaus)
+        num_journeys = data.num_journeys
+        opening = data.opening_match
+        opening_group = self.group_ids.index(opening['group'])
+        host_position = next(k for k, teams in enumerate(chapeaus) if data.host_team in teams)
+
+        # Tirage : chaque groupe reçoit exactement une équipe de chaque chapeau (position k = chapeau k)
+        self.unified_team_vars = {}
+        for chapeau, teams in data.chapeaus.items():
+            for team in teams:
+                for g, group_name in enumerate(self.group_ids):
+                    self.unified_team_vars[(team, g)] = model.NewBoolVar(f"{team}_in_{group_name}")
+                constraints.add(f"{team}_in_one_group", model.AddExactlyOne(
+                    self.unified_team_vars[(team, g)] for g in range(len(self.group_ids))))
+            for g in range(len(self.group_ids)):
+                constraints.add(f"{chapeau}_limit", model.AddExactlyOne(
+                    self.unified_team_vars[(team, g)] for team in teams))
+        constraints.add(f"{data.host_team}_in_{opening['group']}",
+                        model.Add(self.unified_team_vars[(data.host_team, opening_group)] == 1))
+
+        # Rencontres de groupe entre positions : match (g, k, l) avec k < l
+        self.unified_matches = [(g, k, l) for g in range(len(self.group_ids))
+                                for k in range(group_size) for l in range(k + 1, group_size)]
+
+        # Journée de chaque rencontre (round robin)
+        journey_vars = {}
+        for (g, k, l) in self.unified_matches:
+            for r in range(num_journeys):
+                journey_vars[(g, k, l, r)] = model.NewBoolVar(f"match_{g}_{k}_{l}_journey_{r + 1}")
+            constraints.add('each_pair_once',
+                            model.AddExactlyOne(journey_vars[(g, k, l, r)] for r in range(num_journeys)))
+        # Un match par équipe et par journée (au plus un si la taille du groupe est impaire : journée d'exempt)
+        add_round = model.AddAtMostOne if group_size % 2 else model.AddExactlyOne
+        for g in range(len(self.group_ids)):
+            for r in range(num_journeys):
+                for k in range(group_size):
+                    constraints.add('one_match_per_journey', add_round(
+                        journey_vars[(g, min(k, l), max(k, l), r)] for l in range(group_size) if l != k))
+
+        # Créneau (jour, heure) de chaque rencontre, restreint à la fenêtre de sa journée
+        self.unified_slot_vars = {}
+        for (g, k, l) in self.unified_matches:
+            is_opening_match = g == opening_group and host_position in (k, l)
+            for r in range(num_journeys):
+                window = []
+                for day in data.journey_days[r + 1]:
+                    for time_slot in data.journey_time_slots[r + 1]:
+                        # Le jour d'ouverture n'accueille que le match d'ouverture
+                        if day == opening['day'] and (not is_opening_match or time_slot != opening['time_slot']):
+                            continue
+                        var = model.NewBoolVar(f"match_{g}_{k}_{l}_{day}_{time_slot}")
+                        self.unified_slot_vars[(g, k, l, day, time_slot)] = var
+                        window.append(var)
+                constraints.add('journey_windows', model.Add(sum(window) == journey_vars[(g, k, l, r)]))
+
+        # Un seul match par créneau, sauf la dernière journée où les deux matchs d'un groupe sont simultanés
+        last_days = data.journey_days[num_journeys]
+        last_slots = data.journey_time_slots[num_journeys]
+        simultaneous_vars = {}
+        if data.simultaneous_last_journey:
+            for g in range(len(self.group_ids)):
+                for day in last_days:
+                    for time_slot in last_slots:
+                        simultaneous_vars[(g, day, time_slot)] = model.NewBoolVar(
+                            f"group_{g}_last_{day}_{time_slot}")
+                constraints.add('simultaneous_last_journey', model.AddExactlyOne(
+                    simultaneous_vars[(g, day, time_slot)] for day in last_days for time_slot in last_slots))
+            for day in last_days:
+                for time_slot in last_slots:
+                    constraints.add('one_match_per_slot', model.AddAtMostOne(
+                        simultaneous_vars[(g, day, time_slot)] for g in range(len(self.group_ids))))
+        slot_usage = {}
+        for (g, k, l, day, time_slot), var in self.unified_slot_vars.items():
+            if (g, day, time_slot) in simultaneous_vars:
+                constraints.add('simultaneous_last_journey',
+                                model.AddImplication(var, simultaneous_vars[(g, day, time_slot)]))
+            else:
+                slot_usage.setdefault((day, time_slot), []).append(var)
+        for slot_vars in slot_usage.values():
+            constraints.add('one_match_per_slot', model.AddAtMostOne(slot_vars))
+
+        # Match d'ouverture au stade prévu
+        self.unified_stadium_vars = {}
+        for (g, k, l) in self.unified_matches:
+            for stadium in data.stadiums:
+                self.unified_stadium_vars[(g, k, l, stadium)] = model.NewBoolVar(f"match_{g}_{k}_{l}_at_{stadium}")
+            model.AddExactlyOne(self.unified_stadium_vars[(g, k, l, stadium)] for stadium in data.stadiums)
+        opening_slot_vars = []
+        for (g, k, l, day, time_slot), var in self.unified_slot_vars.items():
+            if day == opening['day']:
+                opening_slot_vars.append(var)
+                constraints.add('opening_match',
+                                model.AddImplication(var, self.unified_stadium_vars[(g, k, l, opening['stade'])]))
+        constraints.add('opening_match', model.AddExactlyOne(opening_slot_vars))
+
+        # Numéro réel du jour de chaque rencontre de groupe, pour les jours de repos
+        numbers = data.calendar_day_numbers
+        gap = data.min_rest_days + 1
+        match_day_terms = {}
+        for (g, k, l, day, _), var in self.unified_slot_vars.items():
+            match_day_terms.setdefault((g, k, l), []).append((numbers[data.day_index[day]], var))
+        group_day_vars = {}
+        for (g, k, l), terms in match_day_terms.items():
+            day_number = model.NewIntVar(min(number for number, _ in terms), max(number for number, _ in terms),
+                                         f"match_{g}_{k}_{l}_day")
+            model.Add(day_number == sum(number * var for number, var in terms))
+            group_day_vars.setdefault(g, []).append(day_number)
+
+        # Au moins min_rest_days jours pleins entre deux matchs de groupe d'une même équipe (position du groupe) :
+        # au plus un de ses matchs sur toute fenêtre de gap jours consécutifs
+        position_day_terms = {}
+        for (g, k, l, day, _), var in self.unified_slot_vars.items():
+            for position in (k, l):
+                position_day_terms.setdefault((g, position), []).append((numbers[data.day_index[day]], var))
+        for terms in position_day_terms.values():
+            for start in sorted({number for number, _ in terms}):
+                window = [var for number, var in terms if start <= number < start + gap]
+                if len(window) > 1:
+                    constraints.add('group_rest_days', model.Add(sum(window) <= 1))
+
+        # Phase finale : créneau et stade de chaque match. Comme dans setup_knockout_model, un match a lieu au
+        # moins min_rest_days jours pleins après chaque match des groupes dont une équipe peut s'y présenter et
+        # après les matchs dont il reçoit les vainqueurs
+        self.unified_knockout_matches = []
+        self.unified_knockout_slot_vars = {}
+        self.unified_knockout_stadium_vars = {}
+        letters = [group_name[-1] for group_name in self.group_ids]
+        knockout_day_vars = {}
+        match_id = len(self.unified_matches) + 1
+        for knockout_round in data.knockout_rounds:
+            round_slot_vars = {}
+            for matchup in knockout_round['matchups']:
+                self.unified_knockout_matches.append((match_id, knockout_round['phase'], matchup))
+                slot_vars = []
+                terms = []
+                for day in knockout_round['days']:
+                    for time_slot in knockout_round['time_slots']:
+                        var = model.NewBoolVar(f"match_{match_id}_{day}_{time_slot}")
+                        self.unified_knockout_slot_vars[(match_id, day, time_slot)] = var
+                        round_slot_vars.setdefault((day, time_slot), []).append(var)
+                        slot_vars.append(var)
+                        terms.append((numbers[data.day_index[day]], var))
+                constraints.add(f"{knockout_round['phase']}_window", model.AddExactlyOne(slot_vars))
+                day_number = model.NewIntVar(min(number for number, _ in terms), max(number for number, _ in terms),
+                                             f"match_{match_id}_day")
+                model.Add(day_number == sum(number * var for number, var in terms))
+                knockout_day_vars[match_id] = day_number
+                feeders, group_letters = matchup_sources(matchup, letters)
+                for letter in group_letters:
+                    for group_day in group_day_vars[letters.index(letter)]:
+                        constraints.add('knockout_rest_after_groups', model.Add(day_number >= group_day + gap))
+                for feeder in feeders:
+                    constraints.add('knockout_rest_days', model.Add(day_number >= knockout_day_vars[feeder] + gap))
+                for stadium in data.stadiums:
+                    self.unified_knockout_stadium_vars[(match_id, stadium)] = model.NewBoolVar(
+                        f"match_{match_id}_at_{stadium}")
+                model.AddExactlyOne(self.unified_knockout_stadium_vars[(match_id, stadium)] for stadium in data.stadiums)
+                match_id += 1
+            for slot_vars in round_slot_vars.values():
+                constraints.add('one_match_per_slot', model.AddAtMostOne(slot_vars))
+        final_id = self.unified_knockout_matches[-1][0]
+        constraints.add('final_venue',
+                        model.Add(self.unified_knockout_stadium_vars[(final_id, data.final_stadium)] == 1))
+        for stadium in data.stadiums:
+            constraints.add('knockout_matches_per_stadium', model.Add(
+                sum(self.unified_knockout_stadium_vars[(match_id, stadium)]
+                    for match_id, _, _ in self.unified_knockout_matches) <= data.max_knockout_matches_per_stadium))
+
+        # Un stade accueille au plus un match par jour (groupes et phase finale)
+        day_vars = {}
+        for (g, k, l, day, time_slot), var in self.unified_slot_vars.items():
+            day_vars.setdefault((g, k, l, day), []).append(var)
+        for (match_id, day, time_slot), var in self.unified_knockout_slot_vars.items():
+            day_vars.setdefault((match_id, day), []).append(var)
+        stadium_vars = dict(self.unified_stadium_vars)
+        stadium_vars.update(self.unified_knockout_stadium_vars)
+        stadium_usage = {}
+        for (*match, day), slot_vars in day_vars.items():
+            for stadium in data.stadiums:
+                used = model.NewBoolVar(f"match_{'_'.join(map(str, match))}_{day}_at_{stadium}")
+                model.Add(used >= sum(slot_vars) + stadium_vars[(*match, stadium)] - 1)
+                stadium_usage.setdefault((day, stadium), []).append(used)
+        for used_vars in stadium_usage.values():
+            constraints.add('one_match_per_stadium_per_day', model.AddAtMostOne(used_vars))
+
+    def solve_unified(self):
+        # Résolution du modèle unique en un seul appel
+        solver, status = self._solve('unified_solve', self.unified_model, constraint_groups=self.unified_constraints)
         if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-            return self.matches_journey_1, self.matches_journey_2, self.matches_journey_3
+            return self._extract_unified_solution(solver)
         else:
             print("No feasible solution found.")
             return None, None, None
 
-    def display_schedule(self, journey_1, journey_2, journey_3, knockout_matches):
-        # Affichage des calendriers des phases de groupes
+    def _extract_unified_solution(self, solver):
+        data = self.data
+        chapeaus = list(data.chapeaus.values())
+        groups = {group_name: [] for group_name in self.group_ids}
+        positions = {}
+        for team in data.teams:
+            for g, group_name in enumerate(self.group_ids):
+                if solver.Value(self.unified_team_vars[(team, g)]):
+                    groups[group_name].append(team)
+                    k = next(k for k, teams in enumerate(chapeaus) if team in teams)
+                    positions[(g, k)] = team
+
+        # Matchs de groupe par journée, triés par groupe puis par créneau
+        journeys = [[] for _ in data.journey_days]
+        for (g, k, l, day, time_slot), var in self.unified_slot_vars.items():
+            if not solver.Value(var):
+                continue
+            stadium = next(stadium for stadium in data.stadiums
+                           if solver.Value(self.unified_stadium_vars[(g, k, l, stadium)]))
+            journey = next(r for r, days in data.journey_days.items() if day in days)
+            journeys[journey - 1].append((g, data.days.index(day), data.time_slots.index(time_slot),
+                                          (positions[(g, k)], positions[(g, l)], day, time_slot, stadium)))
+        journeys = [[match for *_, match in sorted(matches)] for matches in journeys]
+
+        knockout_matches = []
+        for match_id, phase, (team1, team2) in self.unified_knockout_matches:
+            day, time_slot = next((day, time_slot) for (m, day, time_slot), var
+                                  in self.unified_knockout_slot_vars.items()
+                                  if m == match_id and solver.Value(var))
+            stadium = next(stadium for stadium in data.stadiums
+                           if solver.Value(self.unified_knockout_stadium_vars[(match_id, stadium)]))
+            knockout_matches.append({
+                'match_id': match_id,
+                'phase': phase,
+                'day': day,
+                'time_slot': time_slot,
+                'team1': team1,
+                'team2': team2,
+                'stade': stadium
+            })
+        knockout_matches.sort(key=lambda match: match['match_id'])
+        return groups, journeys, knockout_matches
+
+    @timed_stage('repair')
+    def repair_schedule(self, journeys, knockout_matches, closures=(), pins=(), max_time_in_seconds=1.0):
+        # Réparation incrémentale d'un calendrier existant : tirage et rencontres restent fixés, seuls les
+        # créneaux et stades des matchs touchés par la perturbation sont recalculés, en changeant le moins
+        # de choses possible. closures : (stade, jour) indisponibles ; pins : (match, jour, créneau[, stade])
+        # où match est une paire d'équipes (phase de groupes) ou un match_id (phase finale).
+        data = self.data
+        opening = data.opening_match
+        num_journeys = len(journeys)
+        closed = set(closures)
+        entries = []
+        for journey, matches in enumerate(journeys, start=1):
+            for team1, team2, day, time_slot, stadium in matches:
+                is_opening = day == opening['day'] and time_slot == opening['time_slot']
+                if is_opening:
+                    options = [(opening['day'], opening['time_slot'])]
+                else:
+                    options = [(d, t) for d in data.journey_days[journey] for t in data.journey_time_slots[journey]
+                               if d != opening['day']]
+                entries.append({
+                    'key': frozenset((team1, team2)), 'teams': (team1, team2), 'phase': journey,
+                    'group': data.group_of_team[data.team_index[team1]]
+                    if journey == num_journeys and data.simultaneous_last_journey else None,
+                    'day': day, 'time_slot': time_slot, 'stade': stadium, 'options': options,
+                    'stadiums': [opening['stade']] if is_opening else data.stadiums
+                })
+        # Origines de chaque match de la phase finale (groupes et matchs précédents), pour les jours de repos
+        letters = [group_name[-1] for group_name in self.group_ids]
+        sources = {}
+        match_id = data.first_knockout_match_id
+        for knockout_round in data.knockout_rounds:
+            for matchup in knockout_round['matchups']:
+                feeders, group_letters = matchup_sources(matchup, letters)
+                sources[match_id] = (feeders, [letters.index(letter) for letter in group_letters])
+                match_id += 1
+        for match in knockout_matches:
+            knockout_round = next(r for r in data.knockout_rounds if r['phase'] == match['phase'])
+            entries.append({
+                'key': match['match_id'], 'phase': match['phase'], 'group': None,
+                'sources': sources.get(match['match_id'], ([], [])),
+                'day': match['day'], 'time_slot': match['time_slot'], 'stade': match['stade'],
+                'options': [(d, t) for d in knockout_round['days'] for t in knockout_round['time_slots']],
+                'stadiums': [data.final_stadium] if match['phase'] == 'final' else data.stadiums
+            })
+        pinned = {}
+        keys = {entry['key'] for entry in entries}
+        for pin in pins:
+            match, day, time_slot, *stadium = pin
+            key = match if isinstance(match, int) else frozenset(match)
+            if key not in keys:
+                raise ValueError(f"pin {pin!r}: {match!r} is not a match of this schedule")
+            pinned[key] = (day, time_slot, stadium[0] if stadium else None)
+
+        # Matchs directement touchés : stade fermé, match déplacé, ou match occupant le créneau visé
+        pinned_slots = {(day, time_slot) for day, time_slot, _ in pinned.values()}
+        affected = {i for i, entry in enumerate(entries)
+                    if (entry['stade'], entry['day']) in closed or entry['key'] in pinned
+                    or (entry['day'], entry['time_slot']) in pinned_slots}
+        if not affected:
+            return journeys, knockout_matches, []
+
+        # Voisinages de plus en plus larges : matchs touchés, puis leur phase, puis tout le calendrier
+        affected_phases = {entries[i]['phase'] for i in affected}
+        neighbourhoods = [affected,
+                          {i for i, entry in enumerate(entries) if entry['phase'] in affected_phases},
+                          set(range(len(entries)))]
+        for free in neighbourhoods:
+            # Les deux derniers matchs d'un groupe sont simultanés : ils bougent ensemble
+            groups_moved = {entries[i]['group'] for i in free if entries[i]['group'] is not None}
+            free = free | {i for i, entry in enumerate(entries) if entry['group'] in groups_moved}
+            # Conflit expliqué seulement pour le calendrier entier, dernier voisinage
+            repaired = self._solve_repair(entries, free, closed, pinned, max_time_in_seconds,
+                                          explain=len(free) == len(entries))
+            if repaired is not None:
+                break
+        else:
+            print("No feasible repair found.")
+            return None, None, None
+
+        changed = []
+        new_journeys = [[] for _ in journeys]
+        new_knockout = []
+        for i, entry in enumerate(entries):
+            day, time_slot, stadium = repaired.get(i, (entry['day'], entry['time_slot'], entry['stade']))
+            if (day, time_slot, stadium) != (entry['day'], entry['time_slot'], entry['stade']):
+                changed.append(entry['key'] if isinstance(entry['key'], int) else tuple(sorted(entry['key'])))
+            if isinstance(entry['key'], int):
+                match = dict(next(m for m in knockout_matches if m['match_id'] == entry['key']))
+                match.update(day=day, time_slot=time_slot, stade=stadium)
+                new_knockout.append(match)
+            else:
+                new_journeys[entry['phase'] - 1].append((*entry['teams'], day, time_slot, stadium))
+        return new_journeys, new_knockout, changed
+
+    def _solve_repair(self, entries, free, closed, pinned, max_time_in_seconds, explain=False):
+        # Modèle restreint aux matchs libres ; les autres matchs sont des occupations fixes. Chaque fermeture de
+        # stade et chaque match déplacé forme son propre groupe de contraintes (explain : conflit recherché)
+        model = cp_model.CpModel()
+        constraints = ConstraintGroups(model)
+        opening = self.data.opening_match
+        opening_options = [(opening['day'], opening['time_slot'])]
+        slot_vars = {}
+        stadium_vars = {}
+        group_slot_vars = {}
+        fixed_slots = {}
+        fixed_group_slots = set()
+        fixed_stadiums = {}
+        fixed_knockout_uses = {}
+        for i, entry in enumerate(entries):
+            if i in free:
+                continue
+            if entry['group'] is not None:
+                fixed_group_slots.add((entry['day'], entry['time_slot']))
+            else:
+                fixed_slots[(entry['day'], entry['time_slot'])] = fixed_slots.get((entry['day'], entry['time_slot']), 0) + 1
+            fixed_stadiums[(entry['day'], entry['stade'])] = fixed_stadiums.get((entry['day'], entry['stade']), 0) + 1
+            if isinstance(entry['key'], int):
+                fixed_knockout_uses[entry['stade']] = fixed_knockout_uses.get(entry['stade'], 0) + 1
+
+        for i in sorted(free):
+            entry = entries[i]
+            for option in entry['options']:
+                if entry['group'] is not None:
+                    # Créneau partagé par les matchs simultanés du groupe
+                    key = (entry['group'], *option)
+                    if key not in group_slot_vars:
+                        group_slot_vars[key] = model.NewBoolVar(f"group_{entry['group']}_{option[0]}_{option[1]}")
+                    slot_vars[(i, option)] = group_slot_vars[key]
+                else:
+                    slot_vars[(i, option)] = model.NewBoolVar(f"match_{i}_{option[0]}_{option[1]}")
+            constraints.add('opening_match' if entry['options'] == opening_options else 'match_windows',
+                            model.AddExactlyOne(slot_vars[(i, option)] for option in entry['options']))
+            for stadium in entry['stadiums']:
+                stadium_vars[(i, stadium)] = model.NewBoolVar(f"match_{i}_at_{stadium}")
+            venue = 'final_venue' if entry['phase'] == 'final' else \
+                'opening_match' if entry['options'] == opening_options else 'match_stadiums'
+            constraints.add(venue, model.AddExactlyOne(stadium_vars[(i, stadium)] for stadium in entry['stadiums']))
+
+            if entry['key'] in pinned:
+                day, time_slot, stadium = pinned[entry['key']]
+                pin = f"pin_{entry['key'] if isinstance(entry['key'], int) else '_'.join(sorted(entry['key']))}"
+                if (i, (day, time_slot)) not in slot_vars or (stadium and (i, stadium) not in stadium_vars):
+                    if explain:
+                        print(f"Infeasible repair_solve: {pin} is outside the window or stadiums of its match")
+                    return None
+                constraints.add(pin, model.Add(slot_vars[(i, (day, time_slot))] == 1))
+                if stadium:
+                    constraints.add(pin, model.Add(stadium_vars[(i, stadium)] == 1))
+
+        # Un match par créneau (un groupe par créneau pour la dernière journée)
+        slot_usage = {}
+        for (i, option), var in slot_vars.items():
+            if entries[i]['group'] is None:
+                slot_usage.setdefault(option, []).append(var)
+        for option, slot_var_list in slot_usage.items():
+            constraints.add('one_match_per_slot', model.Add(sum(slot_var_list) + fixed_slots.get(option, 0) <= 1))
+        group_usage = {}
+        for (group, day, time_slot), var in group_slot_vars.items():
+            group_usage.setdefault((day, time_slot), []).append(var)
+        for option, group_var_list in group_usage.items():
+            constraints.add('one_match_per_slot',
+                            model.Add(sum(group_var_list) + (1 if option in fixed_group_slots else 0) <= 1))
+
+        # Un match par stade et par jour, stades fermés exclus
+        stadium_usage = {}
+        for i in sorted(free):
+            entry = entries[i]
+            days = {}
+            for day, time_slot in entry['options']:
+                days.setdefault(day, []).append(slot_vars[(i, (day, time_slot))])
+            for day, day_vars in days.items():
+                for stadium in entry['stadiums']:
+                    if (stadium, day) in closed:
+                        for var in day_vars:
+                            constraints.add(f"closure_{stadium}_{day}",
+                                            model.AddBoolOr([var.Not(), stadium_vars[(i, stadium)].Not()]))
+                        continue
+                    used = model.NewBoolVar(f"match_{i}_{day}_at_{stadium}")
+                    model.Add(used >= sum(day_vars) + stadium_vars[(i, stadium)] - 1)
+                    stadium_usage.setdefault((day, stadium), []).append(used)
+        for (day, stadium), used_vars in stadium_usage.items():
+            constraints.add('one_match_per_stadium_per_day',
+                            model.Add(sum(used_vars) + fixed_stadiums.get((day, stadium), 0) <= 1))
+
+        # Au plus max_knockout_matches_per_stadium matchs de la phase finale par stade (fixes et libres)
+        knockout_uses = {}
+        for (i, stadium), var in stadium_vars.items():
+            if isinstance(entries[i]['key'], int):
+                knockout_uses.setdefault(stadium, []).append(var)
+        for stadium, use_vars in knockout_uses.items():
+            constraints.add('knockout_matches_per_stadium', model.Add(
+                sum(use_vars) + fixed_knockout_uses.get(stadium, 0) <= self.data.max_knockout_matches_per_stadium))
+
+        # Jours de repos (numéros réels du calendrier) entre deux matchs de groupe d'une même équipe et avant
+        # chaque match de la phase finale ; seuls les enchaînements touchant un match libre sont contraints
+        data = self.data
+        numbers = data.calendar_day_numbers
+        gap = data.min_rest_days + 1
+        day_numbers = {}
+        for i, entry in enumerate(entries):
+            if i in free:
+                day_numbers[i] = sum(numbers[data.day_index[day]] * slot_vars[(i, (day, time_slot))]
+                                     for day, time_slot in entry['options'])
+            else:
+                day_numbers[i] = numbers[data.day_index[entry['day']]]
+        team_entries = {}
+        group_entries = {}
+        knockout_entries = {}
+        for i, entry in enumerate(entries):
+            if isinstance(entry['key'], int):
+                knockout_entries[entry['key']] = i
+                continue
+            for team in entry['teams']:
+                team_entries.setdefault(team, []).append(i)
+            group_entries.setdefault(data.group_of_team[data.team_index[entry['teams'][0]]], []).append(i)
+        for team_matches in team_entries.values():
+            for i, j in zip(team_matches, team_matches[1:]):
+                if i in free or j in free:
+                    constraints.add('group_rest_days', model.Add(day_numbers[j] - day_numbers[i] >= gap))
+        for match_id, i in knockout_entries.items():
+            feeders, source_groups = entries[i]['sources']
+            previous = [('knockout_rest_after_groups', j) for g in source_groups for j in group_entries.get(g, [])]
+            previous += [('knockout_rest_days', knockout_entries[feeder]) for feeder in feeders
+                         if feeder in knockout_entries]
+            for name, j in previous:
+                if i in free or j in free:
+                    constraints.add(name, model.Add(day_numbers[i] - day_numbers[j] >= gap))
+
+        # Objectif : nombre minimal de changements, solution précédente en indication
+        changes = []
+        hinted = set()
+        for i in sorted(free):
+            entry = entries[i]
+            previous_slot = slot_vars.get((i, (entry['day'], entry['time_slot'])))
+            previous_stadium = stadium_vars.get((i, entry['stade']))
+            for var in (previous_slot, previous_stadium):
+                if var is None:
+                    changes.append(1)
+                    continue
+                changes.append(1 - var)
+                if var.Index() not in hinted:
+                    model.AddHint(var, 1)
+                    hinted.add(var.Index())
+        model.Minimize(sum(changes))
+
+        if self.solver_config.max_time_in_seconds is not None:
+            max_time_in_seconds = min(max_time_in_seconds, self.solver_config.max_time_in_seconds)
+        self.metrics.record_model('repair_build', model, None)
+        solver, status = self._solve('repair_solve', model, constraint_groups=constraints if explain else None,
+                                     max_time_in_seconds=max_time_in_seconds)
+        if status != cp_model.OPTIMAL and status != cp_model.FEASIBLE:
+            return None
+        repaired = {}
+        for i in free:
+            entry = entries[i]
+            day, time_slot = next(option for option in entry['options'] if solver.Value(slot_vars[(i, option)]))
+            stadium = next(stadium for stadium in entry['stadiums'] if solver.Value(stadium_vars[(i, stadium)]))
+            repaired[i] = (day, time_slot, stadium)
+        return repaired
+
+    def display_schedule(self, journeys, knockout_matches):
+        # Affichage des calendriers des phases de groupes (regroupement en une passe via l'indice de groupe)
         print("========Let's make the calendar !========")
-        print("group_journey_1 :")
+        team_index = self.data.team_index
+        group_of_team = self.data.group_of_team
         match_count = 1
-        for group_name in self.group_ids:
-            print(f"{group_name}")
-            group_matches = [match for match in journey_1 if
-                             match[0] in self.data.groups[group_name] or match[1] in self.data.groups[group_name]]
-            for match in group_matches:
-                print(f"Match {match_count}: {match[0]} vs {match[1]} - {match[2]} - {match[3]} - {match[4]}")
-                match_count += 1
-
-        print("\ngroup_journey_2 :")
-        for group_name in self.group_ids:
-            print(f"{group_name}")
-            group_matches = [match for match in journey_2 if
-                             match[0] in self.data.groups[group_name] or match[1] in self.data.groups[group_name]]
-            for match in group_matches:
-                print(f"Match {match_count}: {match[0]} vs {match[1]} - {match[2]} - {match[3]} - {match[4]}")
-                match_count += 1
-
-        print("\ngroup_journey_3 :")
-        for group_name in self.group_ids:
-            print(f"{group_name}")
-            group_matches = [match for match in journey_3 if
-                             match[0] in self.data.groups[group_name] or match[1] in self.data.groups[group_name]]
-            for match in group_matches:
-                print(f"Match {match_count}: {match[0]} vs {match[1]} - {match[2]} - {match[3]} - {match[4]}")
-                match_count += 1
+        for journey, matches in enumerate(journeys):
+            if journey:
+                print()
+            print(f"group_journey_{journey + 1} :")
+            group_matches = [[] for _ in self.group_ids]
+            for match in matches:
+                group_matches[group_of_team[team_index[match[0]]]].append(match)
+            for group_name, matches_in_group in zip(self.group_ids, group_matches):
+                print(f"{group_name}")
+                for match in matches_in_group:
+                    print(f"Match {match_count}: {match[0]} vs {match[1]} - {match[2]} - {match[3]} - {match[4]}")
+                    match_count += 1
 
         # Affichage des matchs de la phase finale avec des titres
         print("\n========knockout phase !========")
 
-        # Regrouper les matchs par phase
-        knockout_phases = {'round_of_16': [], 'quarter_final': [], 'semi_final': [], 'final': []}
+        # Regrouper les matchs par phase, dans l'ordre du tableau
+        knockout_phases = {}
         for match in knockout_matches:
-            knockout_phases[match['phase']].append(match)
+            knockout_phases.setdefault(match['phase'], []).append(match)
 
         # Afficher chaque phase
         for phase, matches in knockout_phases.items():
@@ -335,182 +2059,338 @@ class MyModel:
             for match in matches:
                 print(f"Match {match['match_id']}: {match['team1']} - {match['team2']} - {match['day']} - {match['time_slot']} - {match['stade']}")
 
-    def schedule_semi_final(self, euro_data):
-        # Planification des demi-finales
-        match_id = 49  # Début des ID de match pour la phase des demi-finales
-        days = ['Tuesday_09_07', 'Wednesday_10_07']  # Jours alloués aux demi-finales
-        time_slot = '9pm'  # Tous les matchs des demi-finales se jouent à 9pm
+    def resolve_third_places(self, knockout_matches, qualified_groups):
+        # Remplace les désignations de troisièmes ('3A/D/E/F') par le groupe tiré de la table précalculée, une
+        # fois connus les groupes dont le troisième est qualifié (noms de groupes)
+        table = self.data.third_place_table()
+        assignment = table.lookup(sorted(self.group_ids.index(group_name) for group_name in qualified_groups))
+        if assignment is None:
+            raise ValueError(f"{len(table.slots)} third-placed teams qualify, got {sorted(qualified_groups)}")
+        first_phase = self.data.knockout_rounds[0]['phase']
+        first_round = sorted((match for match in knockout_matches if match['phase'] == first_phase),
+                             key=lambda match: match['match_id'])
+        resolved = {}
+        for (index, side, _), g in zip(table.slots, assignment):
+            resolved[(first_round[index]['match_id'], side)] = f"3{self.group_ids[g][-1]}"
         matches = []
-
-        # Simuler les matchs basés sur les hypothétiques vainqueurs des quarts de finale
-        matchups = [
-            ('W45', 'W46'),  # Vainqueurs des matchs des quarts de finale 45 et 46
-            ('W47', 'W48')  # Vainqueurs des matchs des quarts de finale 47 et 48
-        ]
-
-        used_stadiums = {day: [] for day in days}  # Suivre les stades utilisés chaque jour
-
-        # Assigner les matchs sur deux jours
-        for i, matchup in enumerate(matchups):
-            day = days[i]
-            # Sélectionner un stade non utilisé ce jour-là
-            available_stadiums = [stadium for stadium in euro_data.stadiums if stadium not in used_stadiums[day]]
-            if not available_stadiums:
-                continue  # Si aucun stade disponible, passer à la prochaine combinaison
-            stadium = random.choice(available_stadiums)
-            used_stadiums[day].append(stadium)
-
-            matches.append({
-                'match_id': match_id,
-                'phase': 'semi_final',
-                'day': day,
-                'time_slot': time_slot,
-                'team1': matchup[0],
-                # Les équipes ici sont hypothétiques et devraient être déterminées par les résultats réels
-                'team2': matchup[1],
-                'stade': stadium
-            })
-            match_id += 1
-
+        for match in knockout_matches:
+            match = dict(match)
+            for side, key in enumerate(('team1', 'team2')):
+                match[key] = resolved.get((match['match_id'], side), match[key])
+            matches.append(match)
         return matches
 
+    @timed_stage('knockout')
     def schedule_knockout_phase(self, euro_data):
-        # Planification des phases finales
-        matches = self.schedule_round_of_16(euro_data)
-        quarter_final_matches = self.schedule_quarter_final(euro_data)
-        semi_final_matches = self.schedule_semi_final(euro_data)
-        final_match = self.schedule_final(euro_data)
-        matches.extend(quarter_final_matches)
-        matches.extend(semi_final_matches)
-        matches.extend(final_match)
-        return matches
-
-    def schedule_final(self, euro_data):
-        # Planification de la finale
-        match_id = 51  # ID du match pour la finale
-        day = 'Sunday_14_07'  # Jour alloué à la finale
-        time_slot = '9pm'  # Heure du match
-        stadium = 'Olympiastadion'  # Stade choisi pour la finale
-
-        # Simuler les équipes basées sur les vainqueurs hypothétiques des demi-finales
-        team1 = 'W49'  # Vainqueur du match 49 des demi-finales
-        team2 = 'W50'  # Vainqueur du match 50 des demi-finales
-
-        # Création du match de la finale
-        final_match = {
-            'match_id': match_id,
-            'phase': 'final',
-            'day': day,
-            'time_slot': time_slot,
-            'team1': team1,
-            'team2': team2,
-            'stade': stadium
-        }
-
-        return [final_match]  # Retourner une liste contenant uniquement le match de la finale
-
-    def schedule_round_of_16(self, euro_data):
-        # Planification des huitièmes de finale
-        match_id = 37  # Début des ID de match pour la phase round_of_16
-        days = ['Saturday_29_06', 'Sunday_30_06', 'Monday_01_07', 'Tuesday_02_07']  # Jours alloués à la round_of_16
-        time_slots = ['6pm', '9pm']  # Créneaux horaires pour les matchs
-        matches = []
-
-        # Planification hypothétique des matchs basée sur des désignations fictives pour les équipes
-        matchups = [
-            ('1A', '2C'), ('2A', '2B'), ('1B', '3A/D/E/F'), ('1C', '3D/E/F'),
-            ('1F', '3A/B/C'), ('2D', '2E'), ('1E', '3A/B/C/D'), ('1D', '2F')
-        ]
-
-        used_stadiums = {day: [] for day in days}  # Suivre les stades utilisés chaque jour
-
-        # Assigner les matchs sur 4 jours avec 2 matchs par jour
-        for i, matchup in enumerate(matchups):
-            day = days[i // 2]
-            time_slot = time_slots[i % 2]
-
-            # Sélectionner un stade non utilisé ce jour-là
-            available_stadiums = [stadium for stadium in euro_data.stadiums if stadium not in used_stadiums[day]]
-            if not available_stadiums:
-                continue  # Si aucun stade disponible, passer à la prochaine combinaison
-            stadium = random.choice(available_stadiums)
-            used_stadiums[day].append(stadium)
-
-            matches.append({
-                'match_id': match_id,
-                'phase': 'round_of_16',
-                'day': day,
-                'time_slot': time_slot,
-                'team1': matchup[0],  # Les équipes ici sont hypothétiques et devraient être remplacées
-                'team2': matchup[1],
-                'stade': stadium
-            })
-            match_id += 1
-
-        return matches
-
-    def schedule_quarter_final(self, euro_data):
-        # Planification des quarts de finale
-        match_id = 45  # Début des ID de match pour la phase des quarts de finale
-        days = ['Friday_05_07', 'Saturday_06_07']  # Jours alloués aux quarts de finale
-        time_slots = ['6pm', '9pm']  # Créneaux horaires pour les matchs
+        # Planification de la phase finale par CP-SAT. Le résultat ne dépend du calendrier de groupes que par le
+        # jour du dernier match de chaque groupe : il est mis en cache sur cette clé (mode batch)
+        last_group_days = self.last_group_days(euro_data)
+        if last_group_days not in self.knockout_cache:
+            # Puis, d'une exécution à l'autre, dans le magasin de solutions (mêmes jours et même format)
+            key, family = self._knockout_fingerprint(last_group_days)
+            stored = self._stored_solution('knockout', key)
+            if stored is not None:
+                self.knockout_cache[last_group_days] = stored['matches']
+            else:
+                self.setup_knockout_model(last_group_days)
+                self._hint_from_store('knockout', family, self.knockout_model)
+                self.knockout_cache[last_group_days] = self.solve_knockout_model()
+                if self.knockout_cache[last_group_days]:
+                    self._save_solution('knockout', key, {'matches': self.knockout_cache[last_group_days]}, family,
+                                        self.knockout_solver, self.knockout_model)
+        return [dict(match) for match in self.knockout_cache[last_group_days]]
+
+    def last_group_days(self, euro_data):
+        # Code du jour du dernier match de chaque groupe dans self.journey_matches (-1 si le groupe ne joue pas)
+        last_group_days = [-1] * len(self.group_ids)
+        for matches in self.journey_matches:
+            for match in matches:
+                group = euro_data.group_of_team[match.team1]
+                last_group_days[group] = max(last_group_days[group], match.day)
+        return tuple(last_group_days)
+
+    def _knockout_fingerprint(self, last_group_days):
+        # La phase finale ne dépend ni des équipes ni du tirage : la famille est le format seul
+        family = {'format': self._format_fingerprint('pots', 'host_team', 'opening_match'),
+                  'seed': self.solver_config.random_seed}
+        key = dict(family, last_group_days=[self.data.calendar[day] if day >= 0 else None for day in last_group_days])
+        return key, family
+
+    @timed_stage('knockout_build', 'knockout_model')
+    def setup_knockout_model(self, last_group_days):
+        # Modèle (match, jour, créneau, stade) de tout le tableau final défini par data.knockout_rounds.
+        # last_group_days : code du jour du dernier match de chaque groupe (-1 si inconnu). Un match a lieu au
+        # moins min_rest_days jours pleins après le dernier match de groupe de chaque équipe qui peut s'y
+        # présenter et après les matchs dont il reçoit les vainqueurs ; un stade accueille au plus un match par
+        # jour et au plus max_knockout_matches_per_stadium matchs ; la finale se joue au stade prévu.
+        self.knockout_model = cp_model.CpModel()
+        model = self.knockout_model
+        constraints = self.knockout_constraints = ConstraintGroups(model)
+        data = self.data
+        numbers = data.calendar_day_numbers
+        gap = data.min_rest_days + 1
+        letters = [group_name[-1] for group_name in self.group_ids]
+        num_stadiums = len(data.stadiums)
+        self.knockout_entries = []  # (match_id, phase, matchup, créneaux possibles, stades possibles)
+        self.knockout_slot_vars = {}
+        self.knockout_stadium_vars = {}
+        day_number_vars = {}
+        slot_usage = {}
+        stadium_usage = {}
+        match_id = data.first_knockout_match_id
+        final_round = data.knockout_rounds[-1]
+
+        for knockout_round in data.knockout_rounds:
+            for matchup in knockout_round['matchups']:
+                # Premier jour possible d'après le dernier match de groupe des équipes pouvant se qualifier
+                earliest = numbers[0]
+                feeders, group_letters = matchup_sources(matchup, letters)
+                for letter in group_letters:
+                    last_day = last_group_days[letters.index(letter)]
+                    if last_day >= 0:
+                        earliest = max(earliest, numbers[last_day] + gap)
+                options = [(data.day_index[day], data.time_slot_index[time_slot])
+                           for day in knockout_round['days'] for time_slot in knockout_round['time_slots']
+                           if numbers[data.day_index[day]] >= earliest]
+                stadiums = [data.stadium_index[data.final_stadium]] if knockout_round is final_round \
+                    else list(range(num_stadiums))
+                self.knockout_entries.append((match_id, knockout_round['phase'], matchup, options, stadiums))
+
+                for option in options:
+                    var = model.NewBoolVar(f"match_{match_id}_{option[0]}_{option[1]}")
+                    self.knockout_slot_vars[(match_id, option)] = var
+                    slot_usage.setdefault(option, []).append(var)
+                # Jours du tour postérieurs au repos après la phase de groupes
+                constraints.add(f"{knockout_round['phase']}_window_after_group_rest", model.AddExactlyOne(
+                    self.knockout_slot_vars[(match_id, option)] for option in options))
+                for stadium in stadiums:
+                    self.knockout_stadium_vars[(match_id, stadium)] = model.NewBoolVar(f"match_{match_id}_at_{stadium}")
+                constraints.add('final_venue' if knockout_round is final_round else 'knockout_stadiums',
+                                model.AddExactlyOne(self.knockout_stadium_vars[(match_id, stadium)]
+                                                    for stadium in stadiums))
+
+                # Un stade accueille au plus un match par jour
+                day_vars = {}
+                for option in options:
+                    day_vars.setdefault(option[0], []).append(self.knockout_slot_vars[(match_id, option)])
+                for day, slot_vars in day_vars.items():
+                    for stadium in stadiums:
+                        used = model.NewBoolVar(f"match_{match_id}_{day}_at_{stadium}")
+                        model.Add(used >= sum(slot_vars) + self.knockout_stadium_vars[(match_id, stadium)] - 1)
+                        stadium_usage.setdefault((day, stadium), []).append(used)
+
+                # Repos après les matchs dont les vainqueurs se rencontrent ici
+                day_number = model.NewIntVar(min(numbers), max(numbers), f"match_{match_id}_day")
+                model.Add(day_number == sum(numbers[option[0]] * self.knockout_slot_vars[(match_id, option)]
+                                            for option in options))
+                day_number_vars[match_id] = day_number
+                for feeder in feeders:
+                    constraints.add('knockout_rest_days', model.Add(day_number >= day_number_vars[feeder] + gap))
+                match_id += 1
+
+        for slot_vars in slot_usage.values():
+            constraints.add('one_match_per_slot', model.AddAtMostOne(slot_vars))
+        for used_vars in stadium_usage.values():
+            constraints.add('one_match_per_stadium_per_day', model.AddAtMostOne(used_vars))
+
+        # Répartition des stades : au plus N matchs chacun, et le moins possible de stades utilisés plusieurs fois
+        repeated_uses = []
+        for stadium in range(num_stadiums):
+            uses = sum(var for (match_id, s), var in self.knockout_stadium_vars.items() if s == stadium)
+            constraints.add('knockout_matches_per_stadium', model.Add(uses <= data.max_knockout_matches_per_stadium))
+            repeated = model.NewIntVar(0, data.max_knockout_matches_per_stadium, f"stadium_{stadium}_repeated_uses")
+            model.Add(repeated >= uses - 1)
+            repeated_uses.append(repeated)
+        model.Minimize(sum(repeated_uses))
+
+    def solve_knockout_model(self):
+        # Matchs de la phase finale triés par numéro ; liste vide si aucune planification n'est possible
+        solver, status = self._solve('knockout_solve', self.knockout_model, constraint_groups=self.knockout_constraints)
+        self.knockout_solver = solver
+        if status != cp_model.OPTIMAL and status != cp_model.FEASIBLE:
+            print("No feasible solution found.")
+            return []
+        data = self.data
         matches = []
-
-        # Simuler les matchs basés sur les hypothétiques vainqueurs des huitièmes de finale
-        matchups = [
-            ('W39', 'W37'), ('W41', 'W42'), ('W43', 'W44'), ('W40', 'W38')
-        ]
-
-        used_stadiums = {day: [] for day in days}  # Suivre les stades utilisés chaque jour
-
-        # Assigner les matchs sur deux jours avec deux matchs par jour
-        for i, matchup in enumerate(matchups):
-            day = days[i // 2]
-            time_slot = time_slots[i % 2]
-
-            # Sélectionner un stade non utilisé ce jour-là
-            available_stadiums = [stadium for stadium in euro_data.stadiums if stadium not in used_stadiums[day]]
-            if not available_stadiums:
-                continue  # Si aucun stade disponible, passer à la prochaine combinaison
-            stadium = random.choice(available_stadiums)
-            used_stadiums[day].append(stadium)
-
+        for match_id, phase, (team1, team2), options, stadiums in self.knockout_entries:
+            day, time_slot = next(option for option in options
+                                  if solver.Value(self.knockout_slot_vars[(match_id, option)]))
+            stadium = next(stadium for stadium in stadiums
+                           if solver.Value(self.knockout_stadium_vars[(match_id, stadium)]))
             matches.append({
                 'match_id': match_id,
-                'phase': 'quarter_final',
-                'day': day,
-                'time_slot': time_slot,
-                'team1': matchup[0],
-                # Les équipes ici sont hypothétiques et devraient être déterminées par les résultats réels
-                'team2': matchup[1],
-                'stade': stadium
+                'phase': phase,
+                'day': data.calendar[day],
+                'time_slot': data.time_slots[time_slot],
+                'team1': team1,
+                'team2': team2,
+                'stade': data.stadiums[stadium]
             })
-            match_id += 1
-
         return matches
 
-def main():
-    data = TournamentData()
-    print(data.chapeaus['Chapeau_1'])
-    print(data.chapeaus['Chapeau_2'])
-    print(data.chapeaus['Chapeau_3'])
-    print(data.chapeaus['Chapeau_4'])
-    model = MyModel(data)
-    model.setup_model()
-    groups = model.solve()
+def solution_hint(text):
+    # Argument de --hint : NAME=VALUE, VALUE entier
+    name, separator, value = text.rpartition("=")
+    if not separator or not name:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {text!r}")
+    try:
+        return name, int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"value of {name} must be an integer, got {value!r}") from None
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="EURO 2024 schedule with constraint programming")
+    parser.add_argument("--config", metavar="PATH",
+                        help="tournament format as JSON (see formats/euro2024.json); default: built-in EURO 2024")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="number of CP-SAT search workers (0 = OR-Tools default)")
+    parser.add_argument("--time-limit", type=float, default=None,
+                        help="maximum wall time in seconds for each solve")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="random seed for CP-SAT and stadium choices")
+    parser.add_argument("--log", action="store_true",
+                        help="print CP-SAT search progress")
+    parser.add_argument("--sequential", action="store_true",
+                        help="draw groups, then solve each group and place matches greedily")
+    parser.add_argument("--group-workers", type=int, default=1,
+                        help="processes for the per-group matchday solves in --sequential mode (0 = all cores)")
+    parser.add_argument("--batch", type=int, default=0, metavar="N",
+                        help="generate N schedules from distinct draws and write them to --output")
+    parser.add_argument("--output", default="schedules.jsonl",
+                        help="output file for --batch (JSON Lines)")
+    parser.add_argument("--format", choices=["jsonl", "binary"], default="jsonl",
+                        help="output format for --batch (binary = fixed-width records, see schedule_export)")
+    parser.add_argument("--export", metavar="PATH",
+                        help="write the schedule as binary records to PATH instead of printing it")
+    parser.add_argument("--validate", action="store_true",
+                        help="check the schedule against every rule and report violations (in --batch mode: "
+                             "check every schedule and count the invalid ones)")
+    parser.add_argument("--reduced-draw", action="store_true",
+                        help="draw with one group index per team, AllDifferent per pot and group-label symmetry "
+                             "breaking (only canonical draws: --sequential and --batch)")
+    parser.add_argument("--count-draws", action="store_true",
+                        help="print the number of possible and canonical draws and exit")
+    parser.add_argument("--schedules-per-draw", type=int, default=1,
+                        help="schedules generated for each draw in --batch mode")
+    parser.add_argument("--optimize", type=float, nargs="?", const=10.0, default=None, metavar="SECONDS",
+                        help="minimise team travel of the greedy schedule, keeping rest days, within SECONDS "
+                             "(default 10, implies --sequential)")
+    parser.add_argument("--third-places", metavar="GROUPS",
+                        help="letters of the groups whose third-placed team qualifies, e.g. ADEF: the round of 16 "
+                             "shows the resulting pairings")
+    parser.add_argument("--solution-store", metavar="PATH",
+                        help="SQLite file of solved draws, group matchdays, placements and knockout stages: "
+                             "unchanged subproblems are replayed and similar ones solved with hints")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="write model sizes, solver statistics and stage timings as JSON to PATH")
+    parser.add_argument("--hint", type=solution_hint, action="append", default=[], metavar="NAME=VALUE",
+                        help="solution hint for the variable NAME (repeatable)")
+    return parser.parse_args(argv)
+
+def solver_config_from_args(args):
+    hints = dict(args.hint)
+    return SolverConfig(num_search_workers=args.workers, max_time_in_seconds=args.time_limit,
+                        random_seed=args.seed, log_search_progress=args.log, hints=hints)
+
+def third_places_error(data, letters):
+    # Message d'erreur si --third-places ne désigne pas autant de groupes distincts du format que de places
+    # de troisièmes au premier tour de la phase finale, None sinon
+    group_letters = [group_name[-1] for group_name in data.groups]
+    num_slots = len(third_place_slots(data.knockout_rounds[0]['matchups'], list(data.groups)))
+    unknown = sorted(set(letters) - set(group_letters))
+    if unknown:
+        return f"--third-places: unknown groups {''.join(unknown)} (groups are {''.join(group_letters)})"
+    if len(set(letters)) != len(letters):
+        return f"--third-places: {letters} names a group twice"
+    if len(letters) != num_slots:
+        return f"--third-places: {num_slots} third-placed teams qualify, got {len(letters)} groups ({letters})"
+    return None
+
+def main(argv=None):
+    args = parse_args(argv)
+    solver_config = solver_config_from_args(args)
+    if args.config:
+        data = TournamentData.from_config(args.config, solver_config)
+    else:
+        data = TournamentData(solver_config)
+    if args.third_places:
+        args.third_places = args.third_places.upper()
+        error = third_places_error(data, args.third_places)
+        if error:
+            raise SystemExit(f"error: {error}")
+    for teams in data.chapeaus.values():
+        print(teams)
+    store = solution_store.SolutionStore(args.solution_store) if args.solution_store else None
+    model = MyModel(data, group_workers=args.group_workers, solution_store=store)
+    try:
+        run(args, data, model)
+    finally:
+        model.close()
+        if args.metrics:
+            model.metrics.to_json(args.metrics)
+        if store is not None:
+            store.close()
+
+def run(args, data, model):
+    if args.count_draws:
+        counts = count_draws(data)
+        print(f"{counts['draws']} draws, {counts['canonical_draws']} canonical draws (up to group names)")
+        return
+    if args.batch:
+        stats = model.generate_batch(args.batch, args.output, args.schedules_per_draw,
+                                     output_format=args.format, validate=args.validate,
+                                     reduced_draw=args.reduced_draw)
+        print(f"{stats['schedules']} schedules from {stats['draws']} draws written to {args.output} "
+              f"in {stats['seconds']:.1f}s ({stats['schedules_per_sec']:.1f} schedules/sec)")
+        if args.validate:
+            print(f"{stats['invalid']} invalid schedules")
+        return
+    if args.sequential or args.optimize is not None:
+        # Pipeline historique : tirage, matchs de chaque groupe, puis placement glouton
+        model.setup_model(args.reduced_draw)
+        groups = model.solve()
+        journeys = knockout_matches = None
+        if groups:
+            model.setup_model2(groups)
+            if args.optimize is not None and model.journey_matches[-1]:
+                # Amélioration du placement glouton : distance parcourue, jours de repos respectés
+                model.setup_optimization_model()
+                result = model.optimize_schedule(args.optimize, lambda improvement: print(
+                    f"Improved schedule: cost {improvement['objective']:.0f} "
+                    f"(bound {improvement['best_objective_bound']:.0f}) after {improvement['seconds']:.2f}s"))
+                before, after = result['before'], result['after']
+                print(f"Travel: {before['travel_km']} km -> {after['travel_km']} km, missing rest days: "
+                      f"{before['missing_rest_days']} -> {after['missing_rest_days']} ({result['status']})")
+            journeys = model.solve2()
+            knockout_matches = model.schedule_knockout_phase(data)
+    else:
+        # Tirage, journées, créneaux, stades et phase finale résolus en un seul appel
+        model.setup_unified_model()
+        groups, journeys, knockout_matches = model.solve_unified()
     if groups:
         print("========Let's draw groups !========")
         for group_name, teams in groups.items():
             print(f"{group_name}: {teams}")
-            data.groups[group_name] = teams  # Sauvegarder les groupes pour les utiliser plus tard dans la planification
-
-        model.setup_model2(groups)
-        journey_1, journey_2, journey_3 = model.solve2()
-        if journey_1 and journey_2 and journey_3:
-            knockout_matches = model.schedule_knockout_phase(data)
-            model.display_schedule(journey_1, journey_2, journey_3, knockout_matches)
+        data.set_groups(groups)  # Sauvegarder les groupes pour l'affichage du calendrier
+
+        if knockout_matches and args.third_places:
+            qualified_groups = [group_name for group_name in groups if group_name[-1] in args.third_places]
+            knockout_matches = model.resolve_third_places(knockout_matches, qualified_groups)
+        complete = bool(journeys) and all(journeys) and bool(knockout_matches)
+        if complete and args.export:
+            with schedule_export.ScheduleWriter(args.export, schedule_export.Vocabulary.from_data(data)) as writer:
+                writer.write(0, groups, journeys, knockout_matches)
+            print(f"Schedule written to {args.export}")
+        elif complete:
+            model.display_schedule(journeys, knockout_matches)
         else:
             print("Failed to create schedule.")
+        if complete and args.validate:
+            violations = schedule_validator.ScheduleValidator(data).validate(groups, journeys, knockout_matches)
+            print(f"\n========Validation: {'valid' if schedule_validator.is_valid(violations) else 'invalid'} "
+                  f"schedule========")
+            for violation in violations:
+                print(f"{violation.severity} [{violation.rule}] {violation.message}")
     else:
         print("Failed to draw groups, cannot schedule matches.")
 
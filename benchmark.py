@@ -0,0 +1,184 @@
+import argparse
+import contextlib
+import json
+import resource
+import time
+import tracemalloc
+
+from UEFA_EURO2024 import MyModel, SolverConfig, TournamentData, template_phases
+
+# Étapes mesurées séparément (construction du modèle / résolution)
+STAGES = [
+    'draw_build', 'draw_solve',
+    'journey_build', 'journey_solve', 'journey_templates',
+    'group_matches', 'placement', 'knockout_build', 'knockout_solve',
+    'unified_build', 'unified_solve'
+]
+
+
+def percentile(values, q):
+    # Percentile par interpolation linéaire (q entre 0 et 100)
+    values = sorted(values)
+    if not values:
+        return None
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+@contextlib.contextmanager
+def measure(results, stage, trace_memory):
+    if trace_memory:
+        tracemalloc.reset_peak()
+        start_memory = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    yield
+    results[stage] = results.get(stage, 0.0) + time.perf_counter() - start
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1] - start_memory
+        results[f"{stage}_peak"] = max(results.get(f"{stage}_peak", 0), peak)
+
+
+def run_trial(data, solver_config, include_unified=True, trace_memory=False):
+    # Une exécution complète du pipeline, chaque étape chronométrée isolément
+    results = {}
+    model = MyModel(data, solver_config)
+    with measure(results, 'draw_build', trace_memory):
+        model.setup_model()
+    with measure(results, 'draw_solve', trace_memory):
+        groups = model.solve()
+    if not groups:
+        raise RuntimeError("draw model infeasible")
+
+    # Les six modèles de journées, construction et résolution séparées
+    for teams in groups.values():
+        with measure(results, 'journey_build', trace_memory):
+            model.setup_model_journey(teams)
+        with measure(results, 'journey_solve', trace_memory):
+            model.solve_model_journey()
+        with measure(results, 'journey_templates', trace_memory):
+            template_phases(teams)
+
+    # Matchs des groupes (journées du cercle ou CP-SAT) puis placement glouton seul
+    with measure(results, 'group_matches', trace_memory):
+        group_matches = model.generate_group_matches(groups)
+    with measure(results, 'placement', trace_memory):
+        model.setup_model2(groups, group_matches=group_matches)
+
+    # Phase finale : modèle construit et résolu directement, sans le cache de schedule_knockout_phase
+    last_group_days = model.last_group_days(data)
+    with measure(results, 'knockout_build', trace_memory):
+        model.setup_knockout_model(last_group_days)
+    with measure(results, 'knockout_solve', trace_memory):
+        model.solve_knockout_model()
+
+    if include_unified:
+        model = MyModel(data, solver_config)
+        with measure(results, 'unified_build', trace_memory):
+            model.setup_unified_model()
+        with measure(results, 'unified_solve', trace_memory):
+            groups, _, _ = model.solve_unified()
+        if not groups:
+            raise RuntimeError("unified model infeasible")
+    return results
+
+
+def benchmark_format(label, make_data, trials, seed, workers, time_limit, include_unified):
+    timings = {stage: [] for stage in STAGES}
+    error = None
+    try:
+        for trial in range(trials):
+            config = SolverConfig(num_search_workers=workers, max_time_in_seconds=time_limit,
+                                  random_seed=seed + trial)
+            for stage, seconds in run_trial(make_data(), config, include_unified).items():
+                timings[stage].append(seconds)
+
+        # Mémoire de pointe mesurée lors d'un passage distinct : tracemalloc fausserait les temps
+        tracemalloc.start()
+        try:
+            config = SolverConfig(num_search_workers=workers, max_time_in_seconds=time_limit, random_seed=seed)
+            peaks = run_trial(make_data(), config, include_unified, trace_memory=True)
+        finally:
+            tracemalloc.stop()
+    except Exception as exc:  # Un format qui échoue est signalé sans interrompre le balayage
+        error = f"{type(exc).__name__}: {exc}"
+        peaks = {}
+
+    report = {'format': label, 'error': error, 'stages': {}}
+    for stage in STAGES:
+        if not timings[stage]:
+            continue
+        milliseconds = [seconds * 1000 for seconds in timings[stage]]
+        report['stages'][stage] = {
+            'trials': len(milliseconds),
+            'p50_ms': percentile(milliseconds, 50),
+            'p90_ms': percentile(milliseconds, 90),
+            'p99_ms': percentile(milliseconds, 99),
+            'max_ms': max(milliseconds),
+            'peak_kib': peaks.get(f"{stage}_peak", 0) / 1024
+        }
+    return report
+
+
+def formats_from_args(args):
+    # Le format réel de l'EURO 2024 sert de référence, puis le balayage des tailles synthétiques
+    formats = []
+    for size in args.sizes:
+        if size == 'euro':
+            formats.append(("euro2024", TournamentData))
+            continue
+        if size.endswith('.json'):
+            formats.append((size, lambda path=size: TournamentData.from_config(path)))
+            continue
+        for num_stadiums in args.stadiums:
+            for extra_days in args.extra_days:
+                label = f"{size}_teams_{num_stadiums}_stadiums_+{extra_days}_days"
+                formats.append((label, lambda size=int(size), num_stadiums=num_stadiums, extra_days=extra_days:
+                                TournamentData.synthetic(size, num_stadiums, extra_days)))
+    return formats
+
+
+def print_report(report):
+    print(f"\n== {report['format']} ==")
+    if report['error']:
+        print(f"failed: {report['error']}")
+    print(f"{'stage':<18}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'peak KiB':>11}")
+    for stage, stats in report['stages'].items():
+        print(f"{stage:<18}{stats['p50_ms']:>10.2f}{stats['p90_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+              f"{stats['max_ms']:>10.2f}{stats['peak_kib']:>11.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every scheduling stage")
+    parser.add_argument("--sizes", nargs="+", default=["euro", "16", "24", "32", "48"],
+                        help="tournament sizes (number of teams, 'euro' for the real EURO 2024 data, "
+                             "or the path of a JSON tournament format)")
+    parser.add_argument("--stadiums", nargs="+", type=int, default=[10],
+                        help="stadium counts for the synthetic formats")
+    parser.add_argument("--extra-days", nargs="+", type=int, default=[0],
+                        help="extra calendar days for the synthetic formats")
+    parser.add_argument("--trials", type=int, default=5, help="trials per format")
+    parser.add_argument("--seed", type=int, default=0, help="base seed (trial i uses seed + i)")
+    parser.add_argument("--workers", type=int, default=0, help="CP-SAT search workers (0 = default)")
+    parser.add_argument("--time-limit", type=float, default=60.0, help="time limit per solve in seconds")
+    parser.add_argument("--no-unified", action="store_true", help="skip the unified model stages")
+    parser.add_argument("--json", metavar="PATH", help="write the full report as JSON")
+    args = parser.parse_args(argv)
+
+    reports = []
+    for label, make_data in formats_from_args(args):
+        report = benchmark_format(label, make_data, args.trials, args.seed, args.workers, args.time_limit,
+                                  not args.no_unified)
+        print_report(report)
+        reports.append(report)
+
+    max_rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"\nprocess max RSS: {max_rss_kib / 1024:.1f} MiB")
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump({'reports': reports, 'max_rss_kib': max_rss_kib}, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
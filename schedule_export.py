@@ -0,0 +1,292 @@
+import json
+import os
+
+import numpy as np
+
+# En-tête du fichier binaire : signature, taille d'un enregistrement, réservé
+MAGIC = b"EUROSCH\x02"
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('itemsize', '<u4'), ('reserved', '<u4')])
+
+# Un match = 16 octets : tous les noms sont remplacés par de petits codes entiers
+MATCH_DTYPE = np.dtype([
+    ('schedule_id', '<u4'),
+    ('match_id', '<u2'),
+    ('phase', 'u1'),
+    ('group', 'u1'),
+    ('team1', '<u2'),
+    ('team2', '<u2'),
+    ('day', '<u2'),
+    ('time_slot', 'u1'),
+    ('stadium', 'u1')
+])
+NO_GROUP = 255  # Matchs de la phase finale
+INDEX_DTYPE = np.dtype('<u8')  # Index : premier enregistrement de chaque calendrier
+
+# Nombre de codes que peut contenir le champ de chaque catégorie (le code NO_GROUP est réservé)
+CODE_LIMITS = {
+    'phases': 256,
+    'groups': NO_GROUP,
+    'teams': 65536,
+    'days': 65536,
+    'time_slots': 256,
+    'stadiums': 256
+}
+
+
+class Vocabulary:
+    CATEGORIES = ('phases', 'groups', 'teams', 'days', 'time_slots', 'stadiums')
+
+    def __init__(self, names=None):
+        # Table de correspondance nom <-> code pour chaque catégorie
+        names = names or {}
+        self.names = {category: list(names.get(category, [])) for category in self.CATEGORIES}
+        self.codes = {category: {name: code for code, name in enumerate(self.names[category])}
+                      for category in self.CATEGORIES}
+        for category in self.CATEGORIES:
+            self._check_size(category, len(self.names[category]))
+
+    @classmethod
+    def from_data(cls, data):
+        # Codes stables dérivés des données du tournoi (équipes réelles puis désignations de la phase finale) :
+        # les codes des équipes, jours, créneaux et stades sont ceux du noyau indexé de TournamentData
+        knockout_rounds = data.knockout_rounds
+        return cls({
+            'phases': list(data.phase) + [knockout_round['phase'] for knockout_round in knockout_rounds],
+            'groups': list(data.groups),
+            'teams': list(data.teams) + [team for knockout_round in knockout_rounds
+                                         for matchup in knockout_round['matchups'] for team in matchup],
+            'days': list(data.calendar),
+            'time_slots': list(data.time_slots),
+            'stadiums': list(data.stadiums)
+        })
+
+    def code(self, category, name):
+        codes = self.codes[category]
+        if name not in codes:
+            self._check_size(category, len(self.names[category]) + 1)
+            codes[name] = len(self.names[category])
+            self.names[category].append(name)
+        return codes[name]
+
+    def _check_size(self, category, size):
+        # Un code trop grand serait tronqué silencieusement dans l'enregistrement
+        if size > CODE_LIMITS[category]:
+            raise ValueError(f"{size} {category} do not fit the binary schedule format "
+                             f"(at most {CODE_LIMITS[category]})")
+
+    def name(self, category, code):
+        return self.names[category][code]
+
+    def to_dict(self):
+        return {category: list(names) for category, names in self.names.items()}
+
+
+def schedule_records(vocabulary, schedule_id, groups, journeys, knockout_matches):
+    # Convertit un calendrier (tuples de journées + dictionnaires de phase finale) en tableau structuré
+    group_of_team = {team: group_name for group_name, teams in groups.items() for team in teams}
+    rows = []
+    match_id = 1
+    for journey, matches in enumerate(journeys):
+        phase = vocabulary.code('phases', f"group_journey_{journey + 1}")
+        for team1, team2, day, time_slot, stadium in matches:
+            rows.append((schedule_id, match_id, phase, vocabulary.code('groups', group_of_team[team1]),
+                         vocabulary.code('teams', team1), vocabulary.code('teams', team2),
+                         vocabulary.code('days', day), vocabulary.code('time_slots', time_slot),
+                         vocabulary.code('stadiums', stadium)))
+            match_id += 1
+    for match in knockout_matches:
+        rows.append((schedule_id, match['match_id'], vocabulary.code('phases', match['phase']), NO_GROUP,
+                     vocabulary.code('teams', match['team1']), vocabulary.code('teams', match['team2']),
+                     vocabulary.code('days', match['day']), vocabulary.code('time_slots', match['time_slot']),
+                     vocabulary.code('stadiums', match['stade'])))
+    return np.array(rows, dtype=MATCH_DTYPE)
+
+
+def indexed_schedule_records(vocabulary, schedule_id, groups, journey_matches, knockout_matches, data):
+    # Chemin rapide pour les enregistrements Match du noyau indexé (vocabulaire issu de Vocabulary.from_data)
+    group_of_team = {data.team_index[team]: vocabulary.code('groups', group_name)
+                     for group_name, teams in groups.items() for team in teams}
+    rows = []
+    match_id = 1
+    for journey, matches in enumerate(journey_matches):
+        phase = vocabulary.code('phases', f"group_journey_{journey + 1}")
+        for match in matches:
+            rows.append((schedule_id, match_id, phase, group_of_team[match.team1], match.team1, match.team2,
+                         match.day, match.time_slot, match.stadium))
+            match_id += 1
+    records = np.array(rows, dtype=MATCH_DTYPE)
+    if knockout_matches:
+        records = np.concatenate((records, schedule_records(vocabulary, schedule_id, {}, [], knockout_matches)))
+    return records
+
+
+def decode_schedule(vocabulary, records):
+    # Opération inverse : les noms ne sont résolus qu'ici, à la sortie
+    groups = {group_name: [] for group_name in vocabulary.names['groups']}
+    journeys = {}
+    knockout_matches = []
+    for record in records:
+        phase = vocabulary.name('phases', record['phase'])
+        team1 = vocabulary.name('teams', record['team1'])
+        team2 = vocabulary.name('teams', record['team2'])
+        day = vocabulary.name('days', record['day'])
+        time_slot = vocabulary.name('time_slots', record['time_slot'])
+        stadium = vocabulary.name('stadiums', record['stadium'])
+        if record['group'] == NO_GROUP:
+            knockout_matches.append({
+                'match_id': int(record['match_id']),
+                'phase': phase,
+                'day': day,
+                'time_slot': time_slot,
+                'team1': team1,
+                'team2': team2,
+                'stade': stadium
+            })
+            continue
+        group = groups[vocabulary.name('groups', record['group'])]
+        for team in (team1, team2):
+            if team not in group:
+                group.append(team)
+        journeys.setdefault(phase, []).append((team1, team2, day, time_slot, stadium))
+    return {
+        'schedule_id': int(records['schedule_id'][0]) if len(records) else None,
+        'groups': groups,
+        'journeys': [journeys[phase] for phase in sorted(journeys, key=journey_number)],
+        'knockout': knockout_matches
+    }
+
+
+class JsonLinesWriter:
+    # Un calendrier par ligne JSON (format texte du mode batch)
+    def __init__(self, path):
+        self.file = open(path, "w")
+
+    def write(self, schedule_id, groups, journeys, knockout_matches):
+        self.file.write(json.dumps({
+            'schedule_id': schedule_id,
+            'groups': groups,
+            'journeys': journeys,
+            'knockout': knockout_matches
+        }) + "\n")
+
+    def write_indexed(self, schedule_id, groups, journey_matches, knockout_matches, data):
+        self.write(schedule_id, groups, [[match.names(data) for match in matches] for matches in journey_matches],
+                   knockout_matches)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ScheduleWriter:
+    # Écriture en flux d'enregistrements binaires de taille fixe ; le vocabulaire est écrit à côté
+    # (fichier <path>.vocab.json) à la fermeture, car il peut s'enrichir en cours d'écriture. L'indice du
+    # premier enregistrement de chaque calendrier est écrit en flux dans <path>.index (entiers de 8 octets)
+    def __init__(self, path, vocabulary, buffer_size=4096):
+        self.path = path
+        self.vocabulary = vocabulary
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.buffered = 0
+        self.starts = []
+        self.num_records = 0
+        self.file = open(path, "wb")
+        self.index_file = open(index_path(path), "wb")
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header['magic'] = MAGIC
+        header['itemsize'] = MATCH_DTYPE.itemsize
+        header.tofile(self.file)
+
+    def write(self, schedule_id, groups, journeys, knockout_matches):
+        self._append(schedule_records(self.vocabulary, schedule_id, groups, journeys, knockout_matches))
+
+    def write_indexed(self, schedule_id, groups, journey_matches, knockout_matches, data):
+        self._append(indexed_schedule_records(self.vocabulary, schedule_id, groups, journey_matches,
+                                              knockout_matches, data))
+
+    def _append(self, records):
+        self.starts.append(self.num_records)
+        self.num_records += len(records)
+        self.buffer.append(records)
+        self.buffered += len(records)
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            np.concatenate(self.buffer).tofile(self.file)
+            self.buffer = []
+            self.buffered = 0
+        if self.starts:
+            np.array(self.starts, dtype=INDEX_DTYPE).tofile(self.index_file)
+            self.starts = []
+        self.file.flush()
+        self.index_file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        self.index_file.close()
+        with open(vocabulary_path(self.path), "w") as vocabulary_file:
+            json.dump(self.vocabulary.to_dict(), vocabulary_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ScheduleReader:
+    # Lecture par projection mémoire du fichier et de son index : aucun enregistrement n'est chargé avant
+    # d'être consulté, et l'ouverture ne parcourt pas le fichier
+    def __init__(self, path):
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if len(header) != 1 or header['magic'][0] != MAGIC or header['itemsize'][0] != MATCH_DTYPE.itemsize:
+            raise ValueError(f"{path} is not a schedule file")
+        with open(vocabulary_path(path)) as vocabulary_file:
+            self.vocabulary = Vocabulary(json.load(vocabulary_file))
+        if os.path.getsize(path) > HEADER_DTYPE.itemsize:
+            self.records = np.memmap(path, dtype=MATCH_DTYPE, mode='r', offset=HEADER_DTYPE.itemsize)
+        else:
+            self.records = np.zeros(0, dtype=MATCH_DTYPE)
+        # Début de chaque calendrier (les enregistrements sont écrits par calendrier)
+        if os.path.getsize(index_path(path)):
+            self.starts = np.memmap(index_path(path), dtype=INDEX_DTYPE, mode='r')
+        else:
+            self.starts = np.zeros(0, dtype=INDEX_DTYPE)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def schedule_records(self, index):
+        end = self.starts[index + 1] if index + 1 < len(self.starts) else len(self.records)
+        return self.records[self.starts[index]:end]
+
+    def schedule(self, index):
+        return decode_schedule(self.vocabulary, self.schedule_records(index))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.schedule(index)
+
+
+def journey_number(phase):
+    # Numéro de la journée d'une phase 'group_journey_<n>' : tri numérique (group_journey_10 après _2)
+    return int(phase.rpartition('_')[2])
+
+
+def vocabulary_path(path):
+    return f"{path}.vocab.json"
+
+
+def index_path(path):
+    return f"{path}.index"
@@ -0,0 +1,413 @@
+import argparse
+import array
+import asyncio
+import collections
+import concurrent.futures
+import copy
+import hashlib
+import json
+import os
+
+from ortools.sat.python import cp_model
+
+from UEFA_EURO2024 import ConstraintGroups, ModelMetrics, MyModel, SolverConfig, TournamentData
+import schedule_validator
+
+# Réponses HTTP utilisées par le service
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           500: 'Internal Server Error', 503: 'Service Unavailable'}
+MAX_BODY_BYTES = 1 << 20
+
+
+def parse_request(data, request):
+    # Requête de calendrier normalisée : listes triées et dédoublonnées, noms vérifiés contre le format.
+    # Deux requêtes qui ne diffèrent que par l'ordre de leurs contraintes ont la même forme normalisée.
+    # teams_in_groups : équipe -> groupe ; closures : (stade, jour) indisponibles ;
+    # pins : (match_id, jour, créneau[, stade]) pour les matchs de la phase finale
+    if not isinstance(request, dict):
+        raise ValueError("request must be a JSON object")
+    teams_in_groups = dict(request.get('teams_in_groups') or {})
+    for team, group_name in teams_in_groups.items():
+        if team not in data.team_index:
+            raise ValueError(f"unknown team {team!r}")
+        if group_name not in data.groups:
+            raise ValueError(f"unknown group {group_name!r}")
+    closures = sorted({tuple(closure) for closure in request.get('closures') or ()})
+    for closure in closures:
+        if len(closure) != 2 or closure[0] not in data.stadiums or closure[1] not in data.calendar:
+            raise ValueError(f"invalid closure {list(closure)!r}: expected [stadium, day]")
+    knockout_ids = {match_id for match_id, _, _ in knockout_matchups(data)}
+    pins = sorted({tuple(pin) for pin in request.get('pins') or ()})
+    for pin in pins:
+        if len(pin) not in (3, 4) or pin[0] not in knockout_ids or pin[1] not in data.calendar \
+                or pin[2] not in data.time_slots or (len(pin) == 4 and pin[3] not in data.stadiums):
+            raise ValueError(f"invalid pin {list(pin)!r}: expected [match_id, day, time_slot(, stadium)]")
+    if len({pin[0] for pin in pins}) != len(pins):
+        raise ValueError("a knockout match is pinned twice")
+    seed = request.get('seed')
+    if seed is not None and not isinstance(seed, int):
+        raise ValueError("seed must be an integer")
+    return {
+        'format': request.get('format', 'euro2024'),
+        'seed': seed,
+        'teams_in_groups': dict(sorted(teams_in_groups.items())),
+        'closures': [list(closure) for closure in closures],
+        'pins': [list(pin) for pin in pins]
+    }
+
+
+def knockout_matchups(data):
+    # (match_id, phase, affiche) des matchs de la phase finale, numérotés après les matchs de groupe
+    match_id = data.first_knockout_match_id
+    matchups = []
+    for knockout_round in data.knockout_rounds:
+        for matchup in knockout_round['matchups']:
+            matchups.append((match_id, knockout_round['phase'], matchup))
+            match_id += 1
+    return matchups
+
+
+def request_key(normalized):
+    # Empreinte de la requête normalisée (le délai et la validation n'en font pas partie)
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+
+
+def request_distance(normalized, other):
+    # Nombre de contraintes présentes dans une seule des deux requêtes normalisées
+    distance = len(set(normalized['teams_in_groups'].items()) ^ set(other['teams_in_groups'].items()))
+    for field in ('closures', 'pins'):
+        distance += len({tuple(item) for item in normalized[field]} ^ {tuple(item) for item in other[field]})
+    return distance
+
+
+def satisfies(result, normalized):
+    # Vrai si un calendrier déjà résolu respecte toutes les contraintes d'une requête normalisée
+    if 'groups' not in result:
+        return False
+    for team, group_name in normalized['teams_in_groups'].items():
+        if team not in result['groups'][group_name]:
+            return False
+    closed = {tuple(closure) for closure in normalized['closures']}
+    if any((stadium, day) in closed for matches in result['journeys'] for _, _, day, _, stadium in matches) \
+            or any((match['stade'], match['day']) in closed for match in result['knockout']):
+        return False
+    knockout = {match['match_id']: match for match in result['knockout']}
+    for match_id, day, time_slot, *stadium in normalized['pins']:
+        match = knockout[match_id]
+        if (match['day'], match['time_slot']) != (day, time_slot) or (stadium and match['stade'] != stadium[0]):
+            return False
+    return True
+
+
+class ModelTemplate:
+    # Modèle unique d'un format construit une seule fois ; chaque requête en résout une copie (Clone) à laquelle
+    # seules les contraintes de la requête sont ajoutées. Les tables de variables du MyModel restent valables
+    # pour la copie : les indices du proto sont conservés.
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+        self.model = MyModel(data)
+        self.model.setup_unified_model()
+        self.validator = schedule_validator.ScheduleValidator(data)
+        self.num_variables = len(self.model.unified_model.Proto().variables)
+
+    def instantiate(self, normalized, hint=None):
+        # Copie du modèle et contraintes de la requête, chacune dans son groupe nommé (explication des conflits).
+        # hint : valeurs des variables du modèle unique dans la solution d'une requête voisine
+        template = self.model
+        model = template.unified_model.Clone()
+        if hint is not None:
+            model.Proto().solution_hint.vars.extend(range(len(hint)))
+            model.Proto().solution_hint.values.extend(hint)
+        constraints = ConstraintGroups(model)
+        constraints.literals = {name: model.GetBoolVarFromProtoIndex(literal.Index())
+                                for name, literal in template.unified_constraints.literals.items()}
+
+        def var(template_var):
+            return model.GetBoolVarFromProtoIndex(template_var.Index())
+
+        for team, group_name in normalized['teams_in_groups'].items():
+            g = template.group_ids.index(group_name)
+            constraints.add(f"{team}_in_{group_name}", model.Add(var(template.unified_team_vars[(team, g)]) == 1))
+
+        closed = {(stadium, day) for stadium, day in normalized['closures']}
+        if closed:
+            for (*match, day, time_slot), slot_var in template.unified_slot_vars.items():
+                for stadium in self.data.stadiums:
+                    if (stadium, day) in closed:
+                        constraints.add(f"closure_{stadium}_{day}", model.AddBoolOr(
+                            [var(slot_var).Not(), var(template.unified_stadium_vars[(*match, stadium)]).Not()]))
+            for (match_id, day, time_slot), slot_var in template.unified_knockout_slot_vars.items():
+                for stadium in self.data.stadiums:
+                    if (stadium, day) in closed:
+                        constraints.add(f"closure_{stadium}_{day}", model.AddBoolOr(
+                            [var(slot_var).Not(),
+                             var(template.unified_knockout_stadium_vars[(match_id, stadium)]).Not()]))
+
+        for match_id, day, time_slot, *stadium in normalized['pins']:
+            slot_var = template.unified_knockout_slot_vars.get((match_id, day, time_slot))
+            if slot_var is None:
+                raise ValueError(f"pin of match {match_id} is outside the window of its round")
+            constraints.add(f"pin_{match_id}", model.Add(var(slot_var) == 1))
+            if stadium:
+                constraints.add(f"pin_{match_id}", model.Add(
+                    var(template.unified_knockout_stadium_vars[(match_id, stadium[0])]) == 1))
+        return model, constraints
+
+    def solve(self, model, constraints, solver_config):
+        # Exécuté dans un thread du pool : CP-SAT libère le GIL pendant la résolution. Renvoie le résultat et
+        # les valeurs des variables du modèle unique (indications pour les requêtes voisines), ou None
+        solver = cp_model.CpSolver()
+        solver_config.apply(solver, model)
+        status = solver.Solve(model)
+        result = {'format': self.name, 'status': solver.StatusName(status), 'wall_time': solver.WallTime()}
+        values = None
+        if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+            groups, journeys, knockout_matches = self.model._extract_unified_solution(solver)
+            result.update(groups=groups, journeys=journeys, knockout=knockout_matches)
+            values = array.array('i', list(solver.ResponseProto().solution)[:self.num_variables])
+        elif status == cp_model.INFEASIBLE:
+            result['conflicts'] = constraints.explain(solver_config)
+        return result, values
+
+
+class ScheduleService:
+    # Service local : modèles préconstruits par format, file d'attente bornée devant un pool de résolution,
+    # cache LRU des résultats par empreinte de requête normalisée. Une requête identique à une requête en
+    # cours attend son résultat au lieu d'être résolue une seconde fois. Hors cache, un calendrier en cache
+    # du même format et de la même graine qui respecte déjà les contraintes de la requête est réutilisé ;
+    # sinon la solution de la requête en cache la plus proche sert d'indications à la résolution.
+    def __init__(self, formats, workers=1, queue_size=16, cache_size=256, solver_config=None):
+        self.formats = formats
+        self.workers = workers
+        self.solver_config = solver_config or SolverConfig()
+        self.templates = {}
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.cache = collections.OrderedDict()
+        self.cache_size = cache_size
+        self.solutions = {}  # empreinte en cache -> (format, requête normalisée, résultat, valeurs)
+        self.pending = {}
+        self.metrics = ModelMetrics()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self.tasks = []
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        for name, data in self.formats.items():
+            with self.metrics.stage('template_build'):
+                self.templates[name] = await loop.run_in_executor(self.executor, ModelTemplate, name, data)
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def schedule(self, request):
+        # Résultat d'une requête : depuis le cache, une résolution en cours identique, un calendrier en cache
+        # qui la respecte déjà ou la file d'attente. asyncio.QueueFull si la file est pleine, ValueError si la
+        # requête est invalide.
+        self.metrics.count('requests')
+        if not isinstance(request, dict):
+            raise ValueError("request body must be a JSON object")
+        template = self.templates.get(request.get('format', 'euro2024'))
+        if template is None:
+            raise ValueError(f"unknown format; available: {', '.join(self.templates)}")
+        normalized = parse_request(template.data, request)
+        key = request_key(normalized)
+        time_limit = request.get('time_limit')
+        if time_limit is not None and (not isinstance(time_limit, (int, float)) or time_limit <= 0):
+            raise ValueError("time_limit must be a positive number of seconds")
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.metrics.count('cache_hits')
+            result = dict(self.cache[key], cached=True)
+        elif key in self.pending:
+            self.metrics.count('coalesced')
+            result = dict(await asyncio.shield(self.pending[key]), cached=True)
+        else:
+            similar = self._similar(template, normalized)
+            if similar is not None:
+                self.metrics.count('similar_hits')
+                name, _, result, values = similar
+                self._remember(key, name, normalized, result, values)
+                result = dict(result, cached=True)
+            else:
+                future = asyncio.get_running_loop().create_future()
+                try:
+                    self.queue.put_nowait((key, template, normalized, time_limit, future))
+                except asyncio.QueueFull:
+                    self.metrics.count('rejected')
+                    raise
+                self.pending[key] = future
+                result = dict(await asyncio.shield(future), cached=False)
+        if request.get('validate') and 'groups' in result:
+            violations = template.validator.validate(result['groups'], result['journeys'], result['knockout'])
+            result['valid'] = schedule_validator.is_valid(violations)
+            result['violations'] = [violation.to_dict() for violation in violations]
+        return result
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            key, template, normalized, time_limit, future = await self.queue.get()
+            try:
+                solver_config = copy.copy(self.solver_config)
+                solver_config.random_seed = normalized['seed']
+                if time_limit is not None:
+                    solver_config.max_time_in_seconds = time_limit
+                # Copie et contraintes de la requête construites dans le pool : la boucle d'événements reste libre
+                hint = self._nearest(template, normalized)
+                if hint is not None:
+                    self.metrics.count('hinted')
+                with self.metrics.stage('instantiate'):
+                    model, constraints = await loop.run_in_executor(self.executor, template.instantiate,
+                                                                    normalized, hint)
+                with self.metrics.stage('solve'):
+                    result, values = await loop.run_in_executor(self.executor, template.solve, model, constraints,
+                                                                solver_config)
+                self.metrics.count('solves')
+                # Un échec dû au délai n'est pas mis en cache : une nouvelle tentative peut aboutir
+                if result['status'] != 'UNKNOWN' and result['status'] != 'MODEL_INVALID':
+                    self._remember(key, template.name, normalized, result, values)
+                future.set_result(result)
+            except Exception as exc:
+                future.set_exception(exc)
+            finally:
+                self.pending.pop(key, None)
+                self.queue.task_done()
+
+    def _remember(self, key, name, normalized, result, values):
+        self.cache[key] = result
+        if values is not None:
+            self.solutions[key] = (name, normalized, result, values)
+        if len(self.cache) > self.cache_size:
+            evicted, _ = self.cache.popitem(last=False)
+            self.solutions.pop(evicted, None)
+            self.metrics.count('cache_evictions')
+
+    def _similar(self, template, normalized):
+        # Calendrier en cache (même format, même graine) qui respecte déjà toutes les contraintes de la requête
+        for solution in self.solutions.values():
+            name, other, result, _ = solution
+            if name == template.name and other['seed'] == normalized['seed'] and satisfies(result, normalized):
+                return solution
+        return None
+
+    def _nearest(self, template, normalized):
+        # Valeurs de la solution en cache du même format dont la requête diffère le moins, ou None
+        nearest = min((solution for solution in self.solutions.values() if solution[0] == template.name),
+                      key=lambda solution: request_distance(normalized, solution[1]), default=None)
+        return None if nearest is None else nearest[3]
+
+    def stats(self):
+        return {
+            'formats': list(self.templates),
+            'workers': self.workers,
+            'queued': self.queue.qsize(),
+            'in_progress': len(self.pending) - self.queue.qsize(),
+            'cached': len(self.cache),
+            'counters': self.metrics.counters,
+            'stages': self.metrics.stages
+        }
+
+    async def handle(self, method, path, body):
+        # Routage : (code HTTP, objet JSON de la réponse)
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/stats':
+            return 200, self.stats()
+        if path == '/formats':
+            return 200, {name: template.data.to_config() for name, template in self.templates.items()}
+        if path != '/schedule':
+            return 404, {'error': f"unknown path {path}"}
+        if method != 'POST':
+            return 405, {'error': "use POST /schedule"}
+        try:
+            return 200, await self.schedule(json.loads(body or b'{}'))
+        except (ValueError, TypeError) as exc:
+            return 400, {'error': str(exc)}
+        except asyncio.QueueFull:
+            return 503, {'error': "queue full, retry later"}
+        except Exception as exc:
+            return 500, {'error': f"{type(exc).__name__}: {exc}"}
+
+    async def handle_connection(self, reader, writer):
+        # HTTP/1.1 minimal : une requête par connexion, corps JSON de Content-Length octets
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            if len(request_line) < 2:
+                return
+            length = int(headers.get('content-length', 0))
+            if length > MAX_BODY_BYTES:
+                status, response = 400, {'error': "request body too large"}
+            else:
+                body = await reader.readexactly(length) if length else b''
+                status, response = await self.handle(request_line[0].upper(), request_line[1].split('?')[0], body)
+            payload = json.dumps(response).encode()
+            writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+def formats_from_args(args, solver_config):
+    # Format intégré de l'EURO 2024, puis un format par fichier --config (nommé d'après le fichier)
+    formats = {'euro2024': TournamentData(solver_config)}
+    for path in args.config:
+        formats[os.path.splitext(os.path.basename(path))[0]] = TournamentData.from_config(path, solver_config)
+    return formats
+
+
+async def serve(args):
+    solver_config = SolverConfig(num_search_workers=args.search_workers, max_time_in_seconds=args.time_limit)
+    service = ScheduleService(formats_from_args(args, solver_config), args.workers, args.queue_size,
+                              args.cache_size, solver_config)
+    await service.start()
+    if args.unix:
+        server = await asyncio.start_unix_server(service.handle_connection, path=args.unix)
+        print(f"Schedule service listening on {args.unix} ({', '.join(service.templates)})")
+    else:
+        server = await asyncio.start_server(service.handle_connection, args.host, args.port)
+        print(f"Schedule service listening on http://{args.host}:{args.port} ({', '.join(service.templates)})")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local EURO 2024 scheduling service (JSON over HTTP)")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8024, help="TCP port to listen on")
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--config", action="append", default=[], metavar="PATH",
+                        help="additional tournament format as JSON, served under its file name (repeatable)")
+    parser.add_argument("--workers", type=int, default=1, help="solves run at the same time")
+    parser.add_argument("--queue-size", type=int, default=16, help="requests waiting for a worker before 503")
+    parser.add_argument("--cache-size", type=int, default=256, help="results kept in the LRU cache")
+    parser.add_argument("--search-workers", type=int, default=0,
+                        help="CP-SAT search workers per solve (0 = OR-Tools default)")
+    parser.add_argument("--time-limit", type=float, default=None,
+                        help="default maximum wall time in seconds for each solve")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
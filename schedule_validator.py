@@ -0,0 +1,309 @@
+import collections
+
+# Règles vérifiées : identifiant de la violation -> gravité
+RULES = {
+    'unknown_reference': 'error',     # équipe, jour, créneau, stade ou match inconnu
+    'outside_window': 'error',        # jour ou créneau hors de la fenêtre de la journée / du tour
+    'wrong_group': 'error',           # rencontre entre équipes de groupes différents (ou non tirées)
+    'duplicate_pair': 'error',        # même rencontre de groupe programmée plusieurs fois
+    'missing_pair': 'error',          # rencontre de groupe absente
+    'team_journey': 'error',          # équipe programmée deux fois dans la même journée
+    'stadium_day': 'error',           # plus d'un match par stade et par jour
+    'slot_clash': 'error',            # deux matchs au même créneau (hors matchs simultanés d'un groupe)
+    'simultaneous_last_journey': 'error',
+    'opening_match': 'error',
+    'final_venue': 'error',
+    'knockout_count': 'error',        # match du tableau final absent ou en double
+    'knockout_stadium_uses': 'error',
+    'knockout_rest_days': 'error',
+    'group_rest_days': 'error'
+}
+
+
+class Violation:
+    # matches : numéros des matchs concernés (1.. dans l'ordre des journées, match_id pour la phase finale)
+    __slots__ = ('rule', 'message', 'matches', 'severity')
+
+    def __init__(self, rule, message, matches=()):
+        self.rule = rule
+        self.message = message
+        self.matches = tuple(matches)
+        self.severity = RULES[rule]
+
+    def to_dict(self):
+        return {'rule': self.rule, 'severity': self.severity, 'message': self.message,
+                'matches': list(self.matches)}
+
+    def __repr__(self):
+        return f"Violation({self.rule!r}, {self.message!r}, {self.matches!r})"
+
+
+def is_valid(violations):
+    return not any(violation.severity == 'error' for violation in violations)
+
+
+def count_by_rule(violations):
+    return collections.Counter(violation.rule for violation in violations)
+
+
+class ScheduleValidator:
+    # Vérification d'un calendrier complet en une passe sur ses matchs : chaque règle est un accès à un index
+    # (ensembles et tableaux indexés par codes entiers : équipe × journée, jour × stade, jour × créneau...)
+    # préparé une fois par format. Les contrôles globaux (rencontres manquantes, repos) ne parcourent ensuite
+    # que les agrégats par groupe et par équipe. Réutiliser le même validateur pour tous les calendriers
+    # d'un lot.
+    def __init__(self, data):
+        self.data = data
+        self.num_teams = len(data.teams)
+        self.num_days = len(data.calendar)
+        self.num_slots = len(data.time_slots)
+        self.num_stadiums = len(data.stadiums)
+        self.num_journeys = len(data.journey_days)
+        self.numbers = data.calendar_day_numbers
+        self.gap = data.min_rest_days + 1
+        # Créneaux (jour × créneau) autorisés pour chaque journée, codés en un entier
+        self.journey_windows = [frozenset(data.day_index[day] * self.num_slots + data.time_slot_index[time_slot]
+                                          for day in data.journey_days[journey]
+                                          for time_slot in data.journey_time_slots[journey])
+                                for journey in data.journey_days]
+        self.simultaneous = data.simultaneous_last_journey
+        opening = data.opening_match
+        self.host = data.team_index[data.host_team]
+        self.opening_day = data.day_index[opening['day']]
+        self.opening_slot = data.time_slot_index[opening['time_slot']]
+        self.opening_stadium = data.stadium_index[opening['stade']]
+        self.final_stadium = data.stadium_index[data.final_stadium]
+        self.pairs_per_group = data.group_size * (data.group_size - 1) // 2
+
+        # Tableau final attendu : créneaux autorisés, groupes d'origine et matchs d'origine de chaque match
+        letters = [group_name[-1] for group_name in data.groups]
+        self.knockout = {}
+        match_id = data.first_knockout_match_id
+        for knockout_round in data.knockout_rounds:
+            window = frozenset(data.day_index[day] * self.num_slots + data.time_slot_index[time_slot]
+                               for day in knockout_round['days'] for time_slot in knockout_round['time_slots'])
+            for matchup in knockout_round['matchups']:
+                feeders = []
+                groups = set()
+                for label in matchup:
+                    if label.startswith('W'):
+                        feeders.append(int(label[1:]))
+                    elif label.startswith('3rd_'):
+                        groups.update(range(len(letters)))
+                    else:
+                        groups.update(letters.index(letter) for letter in label[1:].split('/'))
+                self.knockout[match_id] = (window, tuple(sorted(groups)), tuple(feeders))
+                match_id += 1
+        self.final_id = match_id - 1
+
+    def validate(self, groups, journeys, knockout_matches):
+        # Calendrier sous forme de noms (tirage, journées de tuples, matchs de la phase finale en dictionnaires)
+        data = self.data
+        violations = []
+        group_of_team = [-1] * self.num_teams
+        for group_name, teams in groups.items():
+            for team in teams:
+                if team in data.team_index and group_name in data.group_index:
+                    group_of_team[data.team_index[team]] = data.group_index[group_name]
+                else:
+                    violations.append(Violation('unknown_reference', f"{team} in {group_name}"))
+        coded = []
+        number = 1
+        for matches in journeys:
+            coded_matches = []
+            for team1, team2, day, time_slot, stadium in matches:
+                try:
+                    coded_matches.append((data.team_index[team1], data.team_index[team2], data.day_index[day],
+                                          data.time_slot_index[time_slot], data.stadium_index[stadium], number))
+                except KeyError as exc:
+                    violations.append(Violation('unknown_reference', f"{exc.args[0]} in match {number}", (number,)))
+                number += 1
+            coded.append(coded_matches)
+        violations.extend(self._check(group_of_team, coded, knockout_matches, groups))
+        return violations
+
+    def validate_indexed(self, journey_matches, knockout_matches):
+        # Chemin rapide pour les enregistrements Match du noyau indexé (tirage enregistré dans data.group_of_team)
+        coded = []
+        number = 1
+        for matches in journey_matches:
+            coded.append([(match.team1, match.team2, match.day, match.time_slot, match.stadium, number + i)
+                          for i, match in enumerate(matches)])
+            number += len(matches)
+        return self._check(self.data.group_of_team, coded, knockout_matches, self.data.groups)
+
+    def _check(self, group_of_team, journeys, knockout_matches, groups):
+        violations = []
+        num_teams = self.num_teams
+        num_slots = self.num_slots
+        num_stadiums = self.num_stadiums
+        num_journeys = self.num_journeys
+        numbers = self.numbers
+        host = self.host
+        pairs = {}                     # paire d'équipes -> numéro du match
+        team_journeys = set()          # équipe × journée
+        stadium_days = {}              # jour × stade -> numéro du match
+        slot_owners = {}               # jour × créneau -> (groupe si matchs simultanés, sinon -1 ; match)
+        last_slots = {}                # groupe -> créneau de la dernière journée
+        team_days = [[] for _ in range(num_teams)]
+        last_group_days = {}           # groupe -> numéro du jour de son dernier match
+        group_counts = collections.Counter()
+        opening_found = False
+
+        for journey, matches in enumerate(journeys, start=1):
+            window = self.journey_windows[journey - 1]
+            shared = self.simultaneous and journey == num_journeys
+            for team1, team2, day, slot, stadium, number in matches:
+                if not (0 <= team1 < num_teams and 0 <= team2 < num_teams and 0 <= day < self.num_days
+                        and 0 <= slot < num_slots and 0 <= stadium < num_stadiums):
+                    violations.append(Violation('unknown_reference', f"match {number} has an unknown code", (number,)))
+                    continue
+                slot_key = day * num_slots + slot
+                if slot_key not in window:
+                    violations.append(Violation('outside_window', f"match {number} is outside the window of "
+                                                                  f"group_journey_{journey}", (number,)))
+                group = group_of_team[team1]
+                if group < 0 or group != group_of_team[team2]:
+                    violations.append(Violation('wrong_group', f"match {number} is not between two teams of the "
+                                                               f"same group", (number,)))
+
+                pair = team1 * num_teams + team2 if team1 < team2 else team2 * num_teams + team1
+                duplicate = pair in pairs
+                if duplicate:
+                    violations.append(Violation('duplicate_pair', f"match {number} repeats match {pairs[pair]}",
+                                                (pairs[pair], number)))
+                else:
+                    pairs[pair] = number
+                    group_counts[group] += 1
+                for team in (team1, team2):
+                    key = team * num_journeys + journey
+                    if key in team_journeys and not duplicate:
+                        violations.append(Violation('team_journey', f"team {self.data.teams[team]} plays twice in "
+                                                                    f"group_journey_{journey}", (number,)))
+                    team_journeys.add(key)
+                    if not duplicate:
+                        team_days[team].append((numbers[day], number))
+
+                key = day * num_stadiums + stadium
+                if key in stadium_days:
+                    violations.append(Violation('stadium_day', f"matches {stadium_days[key]} and {number} share a "
+                                                               f"stadium on the same day", (stadium_days[key], number)))
+                else:
+                    stadium_days[key] = number
+                owner = slot_owners.get(slot_key)
+                if owner is None:
+                    slot_owners[slot_key] = (group if shared else -1, number)
+                elif not shared or owner[0] != group:
+                    violations.append(Violation('slot_clash', f"matches {owner[1]} and {number} share a time slot",
+                                                (owner[1], number)))
+                if shared:
+                    if last_slots.setdefault(group, slot_key) != slot_key:
+                        violations.append(Violation('simultaneous_last_journey', f"match {number} is not played at "
+                                                                                 f"the same time as the other last "
+                                                                                 f"match of its group", (number,)))
+                if last_group_days.get(group, -1) < numbers[day]:
+                    last_group_days[group] = numbers[day]
+
+                if day == self.opening_day:
+                    if (host == team1 or host == team2) and slot == self.opening_slot \
+                            and stadium == self.opening_stadium and not opening_found:
+                        opening_found = True
+                    else:
+                        violations.append(Violation('opening_match', f"match {number} is played on the opening day",
+                                                    (number,)))
+        if not opening_found:
+            violations.append(Violation('opening_match', "the opening match is missing"))
+
+        # Rencontres manquantes : seuls les groupes incomplets sont examinés en détail
+        team_index = self.data.team_index
+        group_index = self.data.group_index
+        for group_name, teams in groups.items():
+            if group_counts[group_index.get(group_name, -1)] >= self.pairs_per_group:
+                continue
+            codes = sorted(team_index[team] for team in teams if team in team_index)
+            for i, team1 in enumerate(codes):
+                for team2 in codes[i + 1:]:
+                    if team1 * num_teams + team2 not in pairs:
+                        violations.append(Violation('missing_pair', f"{self.data.teams[team1]} vs "
+                                                                    f"{self.data.teams[team2]} is not scheduled"))
+
+        # Repos entre deux matchs de groupe d'une même équipe
+        gap = self.gap
+        for team, days in enumerate(team_days):
+            if len(days) > 1:
+                days.sort()
+                for (previous, previous_number), (current, number) in zip(days, days[1:]):
+                    if current - previous < gap:
+                        violations.append(Violation('group_rest_days', f"{self.data.teams[team]} has "
+                                                                       f"{current - previous - 1} rest days before "
+                                                                       f"match {number}", (previous_number, number)))
+
+        # Toujours vérifié : une phase finale absente signale chacun des matchs attendus (knockout_count)
+        violations.extend(self._check_knockout(knockout_matches or (), stadium_days, slot_owners, last_group_days))
+        return violations
+
+    def _check_knockout(self, knockout_matches, stadium_days, slot_owners, last_group_days):
+        data = self.data
+        violations = []
+        num_slots = self.num_slots
+        num_stadiums = self.num_stadiums
+        numbers = self.numbers
+        gap = self.gap
+        seen = set()
+        match_days = {}
+        stadium_uses = collections.Counter()
+        for match in sorted(knockout_matches, key=lambda match: match['match_id']):
+            match_id = match['match_id']
+            expected = self.knockout.get(match_id)
+            day = data.day_index.get(match['day'])
+            slot = data.time_slot_index.get(match['time_slot'])
+            stadium = data.stadium_index.get(match['stade'])
+            if match_id in seen:
+                violations.append(Violation('knockout_count', f"match {match_id} is scheduled twice", (match_id,)))
+                continue
+            seen.add(match_id)
+            if expected is None or day is None or slot is None or stadium is None:
+                violations.append(Violation('unknown_reference', f"knockout match {match_id} refers to an unknown "
+                                                                 f"match, day, time slot or stadium", (match_id,)))
+                continue
+            window, groups, feeders = expected
+            slot_key = day * num_slots + slot
+            if slot_key not in window:
+                violations.append(Violation('outside_window', f"match {match_id} is outside the window of "
+                                                              f"{match['phase']}", (match_id,)))
+            owner = slot_owners.get(slot_key)
+            if owner is None:
+                slot_owners[slot_key] = (-1, match_id)
+            else:
+                violations.append(Violation('slot_clash', f"matches {owner[1]} and {match_id} share a time slot",
+                                            (owner[1], match_id)))
+            key = day * num_stadiums + stadium
+            if key in stadium_days:
+                violations.append(Violation('stadium_day', f"matches {stadium_days[key]} and {match_id} share a "
+                                                           f"stadium on the same day", (stadium_days[key], match_id)))
+            else:
+                stadium_days[key] = match_id
+            stadium_uses[stadium] += 1
+            if stadium_uses[stadium] == data.max_knockout_matches_per_stadium + 1:
+                violations.append(Violation('knockout_stadium_uses', f"{match['stade']} hosts more than "
+                                                                     f"{data.max_knockout_matches_per_stadium} "
+                                                                     f"knockout matches", (match_id,)))
+            if match_id == self.final_id and stadium != self.final_stadium:
+                violations.append(Violation('final_venue', f"the final is played at {match['stade']}", (match_id,)))
+
+            # Repos : après le dernier match de groupe des équipes qui peuvent se présenter, et après les
+            # matchs d'origine (le tableau est numéroté dans l'ordre des tours : ils sont déjà indexés)
+            day_number = numbers[day]
+            match_days[match_id] = day_number
+            previous = [(last_group_days[g], None) for g in groups if g in last_group_days]
+            previous += [(match_days[feeder], feeder) for feeder in feeders if feeder in match_days]
+            for previous_day, feeder in previous:
+                if day_number - previous_day < gap:
+                    source = f"match {feeder}" if feeder else "the group stage"
+                    violations.append(Violation('knockout_rest_days', f"match {match_id} comes "
+                                                                      f"{day_number - previous_day - 1} rest days "
+                                                                      f"after {source}", (match_id,)))
+        for match_id in self.knockout:
+            if match_id not in seen:
+                violations.append(Violation('knockout_count', f"match {match_id} is not scheduled", (match_id,)))
+        return violations
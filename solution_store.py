@@ -0,0 +1,101 @@
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+
+# Incrémenté à chaque changement des modèles ou du contenu des solutions : les anciennes entrées ne sont plus lues
+STORE_VERSION = 1
+
+
+def fingerprint(stage, canonical):
+    # Empreinte d'une forme canonique (objet JSON dont les ensembles sont déjà triés)
+    text = json.dumps([STORE_VERSION, stage, canonical], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def canonical_pots(chapeaus):
+    # Chapeaux sans leurs noms ni l'ordre des équipes : seul compte quelles équipes partagent un chapeau
+    return sorted(sorted(teams) for teams in chapeaus.values())
+
+
+def solution_values(solver, model):
+    # Valeurs des variables nommées de la solution (indications pour un modèle voisin) ; les littéraux
+    # d'activation des groupes de contraintes sont fixés et n'ont pas besoin d'être indiqués
+    values = solver.ResponseProto().solution
+    return {var.name: values[index] for index, var in enumerate(model.Proto().variables)
+            if var.name and not var.name.startswith('enforce_')}
+
+
+class SolutionStore:
+    # Solutions persistantes des sous-problèmes (tirage, journées d'un groupe, placement, phase finale) dans une
+    # base SQLite : une ligne par empreinte de modèle, solution en JSON compressé. La famille regroupe les
+    # modèles voisins (mêmes groupes, même équipe de groupe...) dont la solution sert d'indications à CP-SAT.
+    # Les écritures sont validées par lots de commit_every (et à la fermeture) : une écriture par sous-problème
+    # coûterait plus cher que le placement glouton qu'elle évite.
+    def __init__(self, path, commit_every=256):
+        self.path = path
+        self.commit_every = commit_every
+        self.uncommitted = 0
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS solutions (fingerprint TEXT PRIMARY KEY, stage TEXT NOT NULL, "
+            "family TEXT, solution BLOB NOT NULL, created REAL NOT NULL, used REAL NOT NULL, "
+            "hits INTEGER NOT NULL DEFAULT 0)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS solutions_family ON solutions (family, used)")
+        self.connection.commit()
+
+    def lookup(self, stage, canonical):
+        # Solution du modèle de même forme canonique, ou None
+        key = fingerprint(stage, canonical)
+        row = self.connection.execute("SELECT solution FROM solutions WHERE fingerprint = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self.connection.execute("UPDATE solutions SET hits = hits + 1, used = ? WHERE fingerprint = ?",
+                                (time.time(), key))
+        self._written()
+        return json.loads(zlib.decompress(row[0]))
+
+    def nearest(self, stage, family):
+        # Solution la plus récemment utilisée d'un modèle de la même famille, ou None
+        row = self.connection.execute(
+            "SELECT solution FROM solutions WHERE family = ? ORDER BY used DESC LIMIT 1",
+            (fingerprint(stage, family),)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def save(self, stage, canonical, solution, family=None):
+        now = time.time()
+        blob = zlib.compress(json.dumps(solution, separators=(',', ':')).encode())
+        self.connection.execute(
+            "INSERT OR REPLACE INTO solutions (fingerprint, stage, family, solution, created, used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (fingerprint(stage, canonical), stage, None if family is None else fingerprint(stage, family),
+             blob, now, now))
+        self._written()
+
+    def _written(self):
+        self.uncommitted += 1
+        if self.uncommitted >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        self.connection.commit()
+        self.uncommitted = 0
+
+    def stats(self):
+        # Nombre d'entrées, de réutilisations et taille compressée par étape
+        rows = self.connection.execute(
+            "SELECT stage, COUNT(*), SUM(hits), SUM(LENGTH(solution)) FROM solutions GROUP BY stage")
+        return {stage: {'entries': entries, 'hits': hits, 'bytes': size} for stage, entries, hits, size in rows}
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from UEFA_EURO2024 import MyModel, SolverConfig, TournamentData  # noqa: E402
+
+
+def run_sequential(data, solution_store=None):
+    # Pipeline séquentiel complet : tirage, journées, placement glouton, phase finale
+    model = MyModel(data, solution_store=solution_store)
+    model.setup_model()
+    groups = model.solve()
+    data.set_groups(groups)
+    model.setup_model2(groups)
+    journeys = model.solve2()
+    knockout_matches = model.schedule_knockout_phase(data)
+    return model, groups, journeys, knockout_matches
+
+
+@pytest.fixture
+def sequential():
+    return run_sequential
+
+
+@pytest.fixture
+def euro_data():
+    return TournamentData(SolverConfig(random_seed=1))
+
+
+@pytest.fixture
+def euro_schedule(euro_data):
+    # (modèle, groupes, journées, matchs de la phase finale) d'un calendrier EURO 2024 valide et reproductible
+    return run_sequential(euro_data)
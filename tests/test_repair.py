@@ -0,0 +1,56 @@
+import pytest
+
+from schedule_validator import ScheduleValidator
+
+
+def scheduled_at(journeys, knockout_matches):
+    return {(stadium, day) for matches in journeys for _, _, day, _, stadium in matches} | \
+        {(match['stade'], match['day']) for match in knockout_matches}
+
+
+def test_unknown_pin_is_rejected(euro_schedule):
+    model, groups, journeys, knockout_matches = euro_schedule
+    with pytest.raises(ValueError):
+        model.repair_schedule(journeys, knockout_matches, pins=[(("Germany", "Nobody"), "Wednesday_19_06", "9pm")])
+    with pytest.raises(ValueError):
+        model.repair_schedule(journeys, knockout_matches, pins=[(99, "Sunday_14_07", "9pm")])
+
+
+def test_nothing_to_repair(euro_schedule):
+    model, groups, journeys, knockout_matches = euro_schedule
+    assert model.repair_schedule(journeys, knockout_matches) == (journeys, knockout_matches, [])
+
+
+def test_closure_moves_only_the_affected_match(euro_data, euro_schedule):
+    model, groups, journeys, knockout_matches = euro_schedule
+    team1, team2, day, time_slot, stadium = journeys[1][0]
+    repaired, repaired_knockout, changed = model.repair_schedule(journeys, knockout_matches,
+                                                                 closures=[(stadium, day)])
+
+    assert (stadium, day) not in scheduled_at(repaired, repaired_knockout)
+    assert tuple(sorted((team1, team2))) in changed
+    assert ScheduleValidator(euro_data).validate(groups, repaired, repaired_knockout) == []
+
+
+def test_pins_are_respected(euro_data, euro_schedule):
+    model, groups, journeys, knockout_matches = euro_schedule
+    team1, team2, *_ = journeys[1][0]
+    repaired, repaired_knockout, changed = model.repair_schedule(
+        journeys, knockout_matches, closures=[("Veltins_Arena", "Sunday_16_06")],
+        pins=[((team1, team2), "Wednesday_19_06", "9pm"), (40, "Sunday_30_06", "6pm", "Olympiastadion")])
+
+    match = next(match for match in repaired[1] if set(match[:2]) == {team1, team2})
+    assert match[2:4] == ("Wednesday_19_06", "9pm")
+    knockout_match = next(match for match in repaired_knockout if match['match_id'] == 40)
+    assert (knockout_match['day'], knockout_match['time_slot'], knockout_match['stade']) == \
+        ("Sunday_30_06", "6pm", "Olympiastadion")
+    assert ("Veltins_Arena", "Sunday_16_06") not in scheduled_at(repaired, repaired_knockout)
+    assert ScheduleValidator(euro_data).validate(groups, repaired, repaired_knockout) == []
+
+
+def test_impossible_closure_finds_no_repair(euro_data, euro_schedule):
+    # Le match d'ouverture ne peut pas quitter son stade
+    model, groups, journeys, knockout_matches = euro_schedule
+    opening = euro_data.opening_match
+    assert model.repair_schedule(journeys, knockout_matches,
+                                 closures=[(opening['stade'], opening['day'])]) == (None, None, None)
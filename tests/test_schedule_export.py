@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+import schedule_export
+from schedule_export import MATCH_DTYPE, ScheduleReader, ScheduleWriter, Vocabulary
+
+
+def sorted_groups(groups):
+    return {group_name: sorted(teams) for group_name, teams in groups.items()}
+
+
+def test_match_records_are_16_bytes():
+    assert MATCH_DTYPE.itemsize == 16
+
+
+def test_records_round_trip(euro_data, euro_schedule):
+    _, groups, journeys, knockout_matches = euro_schedule
+    records = schedule_export.schedule_records(Vocabulary.from_data(euro_data), 7, groups, journeys,
+                                               knockout_matches)
+    decoded = schedule_export.decode_schedule(Vocabulary.from_data(euro_data), records)
+
+    assert decoded['schedule_id'] == 7
+    assert decoded['journeys'] == [list(matches) for matches in journeys]
+    assert decoded['knockout'] == knockout_matches
+    assert sorted_groups(decoded['groups']) == sorted_groups(groups)
+
+
+def test_journeys_are_decoded_in_numeric_order():
+    # group_journey_10 et 11 viennent après group_journey_2
+    journeys = [[(f"Team_{2 * j}", f"Team_{2 * j + 1}", f"Day_{j}", "6pm", "Stadium")] for j in range(12)]
+    groups = {'group_A': [team for matches in journeys for match in matches for team in match[:2]]}
+    vocabulary = Vocabulary()
+    records = schedule_export.schedule_records(vocabulary, 0, groups, journeys, [])
+    assert schedule_export.decode_schedule(vocabulary, records)['journeys'] == journeys
+
+
+def test_writer_and_reader_round_trip(tmp_path, euro_data, euro_schedule):
+    _, groups, journeys, knockout_matches = euro_schedule
+    path = str(tmp_path / "schedules.bin")
+    # Petit tampon : plusieurs vidages, et donc plusieurs écritures de l'index
+    with ScheduleWriter(path, Vocabulary.from_data(euro_data), buffer_size=60) as writer:
+        for schedule_id in range(3):
+            writer.write(schedule_id, groups, journeys, knockout_matches)
+    assert os.path.getsize(schedule_export.index_path(path)) == 3 * schedule_export.INDEX_DTYPE.itemsize
+
+    reader = ScheduleReader(path)
+    assert len(reader) == 3
+    for schedule_id, schedule in enumerate(reader):
+        assert schedule['schedule_id'] == schedule_id
+        assert schedule['journeys'] == [list(matches) for matches in journeys]
+        assert schedule['knockout'] == knockout_matches
+
+
+def test_reader_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not a schedule file")
+    with pytest.raises(ValueError):
+        ScheduleReader(str(path))
+
+
+def test_codes_that_overflow_their_field_are_rejected():
+    vocabulary = Vocabulary({'time_slots': [f"slot_{i}" for i in range(256)]})
+    with pytest.raises(ValueError):
+        vocabulary.code('time_slots', "one_more")
+    with pytest.raises(ValueError):
+        Vocabulary({'groups': [f"group_{i}" for i in range(schedule_export.NO_GROUP + 1)]})
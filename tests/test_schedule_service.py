@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+import pytest
+
+import schedule_service
+from UEFA_EURO2024 import SolverConfig, TournamentData
+
+
+def run_service(scenario):
+    # Service EURO 2024 démarré dans sa propre boucle, arrêté après le scénario
+    async def main():
+        service = schedule_service.ScheduleService({'euro2024': TournamentData(SolverConfig())})
+        await service.start()
+        try:
+            return await scenario(service)
+        finally:
+            await service.close()
+    return asyncio.run(main())
+
+
+def post(service, body):
+    return service.handle('POST', '/schedule', body if isinstance(body, bytes) else json.dumps(body).encode())
+
+
+@pytest.mark.parametrize('body, error', [
+    (b'[1, 2]', "request body must be a JSON object"),
+    (b'"euro2024"', "request body must be a JSON object"),
+    (b'{not json', "Expecting property name"),
+    ({'format': 'euro2028'}, "unknown format"),
+    ({'teams_in_groups': {'Nobody': 'group_B'}}, "unknown team 'Nobody'"),
+    ({'teams_in_groups': {'Spain': 'group_Z'}}, "unknown group 'group_Z'"),
+    ({'closures': [['Allianz_Arena']]}, "invalid closure"),
+    ({'pins': [[51, 'Sunday_14_07', '9pm'], [51, 'Sunday_14_07', '6pm']]}, "pinned twice"),
+    ({'pins': [[37, 'Sunday_14_07', '9pm']]}, "outside the window"),
+    ({'seed': 'one'}, "seed must be an integer"),
+    ({'time_limit': -1}, "time_limit must be a positive number"),
+])
+def test_invalid_requests_get_400(body, error):
+    async def scenario(service):
+        return await post(service, body)
+
+    status, response = run_service(scenario)
+    assert status == 400
+    assert error in response['error']
+
+
+def test_routes():
+    async def scenario(service):
+        return [await service.handle('GET', '/health', b''), await service.handle('GET', '/schedule', b''),
+                await service.handle('GET', '/nope', b'')]
+
+    health, wrong_method, unknown_path = run_service(scenario)
+    assert health == (200, {'status': 'ok'})
+    assert wrong_method[0] == 405
+    assert unknown_path[0] == 404
+
+
+def test_conflicting_request_explains_and_is_cached():
+    request = {'seed': 1, 'teams_in_groups': {'Spain': 'group_B', 'France': 'group_B'}}
+
+    async def scenario(service):
+        first = await post(service, request)
+        # Même requête, contraintes dans un autre ordre : réponse du cache
+        second = await post(service, dict(request, teams_in_groups={'France': 'group_B', 'Spain': 'group_B'}))
+        return first, second, service.stats()['counters']
+
+    (status, first), (_, second), counters = run_service(scenario)
+    assert status == 200
+    assert first['status'] == 'INFEASIBLE'
+    assert {'Spain_in_group_B', 'France_in_group_B'} <= set(first['conflicts'])
+    assert 'groups' not in first
+    assert not first['cached'] and second['cached']
+    assert second['conflicts'] == first['conflicts']
+    assert counters['solves'] == 1 and counters['cache_hits'] == 1
+
+
+def test_normalised_requests_share_a_key():
+    data = TournamentData(SolverConfig())
+    request = {'closures': [['Allianz_Arena', 'Monday_17_06'], ['Olympiastadion', 'Saturday_15_06']],
+               'pins': [[51, 'Sunday_14_07', '9pm']], 'teams_in_groups': {'Spain': 'group_B', 'Italy': 'group_B'}}
+    reordered = {'closures': request['closures'][::-1] + request['closures'][:1], 'pins': request['pins'],
+                 'teams_in_groups': {'Italy': 'group_B', 'Spain': 'group_B'}}
+    assert schedule_service.request_key(schedule_service.parse_request(data, request)) == \
+        schedule_service.request_key(schedule_service.parse_request(data, reordered))
+
+
+def test_similar_requests():
+    data = TournamentData(SolverConfig())
+    cached = schedule_service.parse_request(data, {'teams_in_groups': {'Spain': 'group_B'}})
+    result = {
+        'groups': {'group_B': ['Spain', 'Croatia', 'Italy', 'Albania']},
+        'journeys': [[('Spain', 'Croatia', 'Saturday_15_06', '6pm', 'Olympiastadion')]],
+        'knockout': [{'match_id': 51, 'phase': 'final', 'day': 'Sunday_14_07', 'time_slot': '9pm',
+                      'team1': 'W49', 'team2': 'W50', 'stade': 'Olympiastadion'}]
+    }
+    met = schedule_service.parse_request(data, {'teams_in_groups': {'Spain': 'group_B', 'Italy': 'group_B'},
+                                                'closures': [['Allianz_Arena', 'Saturday_15_06']],
+                                                'pins': [[51, 'Sunday_14_07', '9pm']]})
+    assert schedule_service.satisfies(result, met)
+    assert schedule_service.request_distance(met, cached) == 3
+    closed = schedule_service.parse_request(data, {'closures': [['Olympiastadion', 'Saturday_15_06']]})
+    assert not schedule_service.satisfies(result, closed)
+    pinned = schedule_service.parse_request(data, {'pins': [[51, 'Sunday_14_07', '9pm', 'Allianz_Arena']]})
+    assert not schedule_service.satisfies(result, pinned)
+    assert not schedule_service.satisfies({'status': 'INFEASIBLE'}, met)
@@ -0,0 +1,94 @@
+import copy
+
+import pytest
+
+import schedule_validator
+from schedule_validator import ScheduleValidator
+
+
+def rules(violations):
+    return {violation.rule for violation in violations}
+
+
+def next_day(data, day):
+    return data.calendar[data.day_index[day] + 1]
+
+
+def clash_slot(data, journeys, knockout_matches):
+    # Deux matchs de groupe de la première journée au même créneau
+    first, second = journeys[0][1], journeys[0][2]
+    journeys[0][2] = (*second[:2], first[2], first[3], second[4])
+
+
+def share_stadium(data, journeys, knockout_matches):
+    first, second = journeys[0][1], journeys[0][2]
+    journeys[0][2] = (*second[:2], first[2], second[3], first[4])
+
+
+def drop_group_match(data, journeys, knockout_matches):
+    del journeys[1][0]
+
+
+def group_match_too_soon(data, journeys, knockout_matches):
+    # Le deuxième match d'une équipe, le lendemain de son premier
+    team1, team2, day, time_slot, stadium = journeys[0][1]
+    i, match = next((i, match) for i, match in enumerate(journeys[1]) if team1 in match[:2])
+    journeys[1][i] = (*match[:2], next_day(data, day), match[3], match[4])
+
+
+def move_opening_match(data, journeys, knockout_matches):
+    team1, team2, day, time_slot, stadium = journeys[0][0]
+    journeys[0][0] = (team1, team2, day, time_slot, next(s for s in data.stadiums if s != stadium))
+
+
+def move_final(data, journeys, knockout_matches):
+    knockout_matches[-1]['stade'] = next(s for s in data.stadiums if s != data.final_stadium)
+
+
+def final_without_rest(data, journeys, knockout_matches):
+    knockout_matches[-1]['day'] = knockout_matches[-2]['day']
+
+
+def drop_knockout_match(data, journeys, knockout_matches):
+    del knockout_matches[0]
+
+
+def unknown_stadium(data, journeys, knockout_matches):
+    journeys[2][0] = (*journeys[2][0][:4], "Nowhere")
+
+
+@pytest.mark.parametrize('mutation, rule', [
+    (clash_slot, 'slot_clash'),
+    (share_stadium, 'stadium_day'),
+    (drop_group_match, 'missing_pair'),
+    (group_match_too_soon, 'group_rest_days'),
+    (move_opening_match, 'opening_match'),
+    (move_final, 'final_venue'),
+    (final_without_rest, 'knockout_rest_days'),
+    (drop_knockout_match, 'knockout_count'),
+    (unknown_stadium, 'unknown_reference'),
+])
+def test_broken_schedule_is_reported(euro_data, euro_schedule, mutation, rule):
+    _, groups, journeys, knockout_matches = euro_schedule
+    journeys = [list(matches) for matches in journeys]
+    knockout_matches = copy.deepcopy(knockout_matches)
+    mutation(euro_data, journeys, knockout_matches)
+
+    violations = ScheduleValidator(euro_data).validate(groups, journeys, knockout_matches)
+    assert rule in rules(violations)
+    assert schedule_validator.RULES[rule] == 'error'
+    assert not schedule_validator.is_valid(violations)
+    assert schedule_validator.count_by_rule(violations)[rule] >= 1
+
+
+def test_generated_schedule_is_valid(euro_data, euro_schedule):
+    _, groups, journeys, knockout_matches = euro_schedule
+    violations = ScheduleValidator(euro_data).validate(groups, journeys, knockout_matches)
+    assert violations == []
+    assert schedule_validator.is_valid(violations)
+
+
+def test_indexed_validation_matches(euro_data, euro_schedule):
+    model, groups, journeys, knockout_matches = euro_schedule
+    validator = ScheduleValidator(euro_data)
+    assert validator.validate_indexed(model.journey_matches, knockout_matches) == []
@@ -0,0 +1,39 @@
+from UEFA_EURO2024 import SolverConfig, TournamentData
+import solution_store
+
+
+def test_replay_gives_identical_schedule(tmp_path, sequential):
+    path = str(tmp_path / "store.sqlite")
+    with solution_store.SolutionStore(path) as store:
+        first_model, *first = sequential(TournamentData(SolverConfig(random_seed=1)), store)
+    with solution_store.SolutionStore(path) as store:
+        second_model, *second = sequential(TournamentData(SolverConfig(random_seed=1)), store)
+
+    assert second == first
+    for stage in ('draw', 'placement', 'knockout'):
+        assert first_model.metrics.counters[f'{stage}_store_misses'] == 1
+        assert second_model.metrics.counters[f'{stage}_store_hits'] == 1
+        assert f'{stage}_store_misses' not in second_model.metrics.counters
+
+
+def test_fingerprint_ignores_pot_names_and_team_order():
+    pots = {'Chapeau_1': ['Spain', 'France'], 'Chapeau_2': ['Italy', 'Austria']}
+    renamed = {'Pot_B': ['Austria', 'Italy'], 'Pot_A': ['France', 'Spain']}
+    assert solution_store.canonical_pots(pots) == solution_store.canonical_pots(renamed)
+    assert solution_store.fingerprint('draw', solution_store.canonical_pots(pots)) == \
+        solution_store.fingerprint('draw', solution_store.canonical_pots(renamed))
+    assert solution_store.fingerprint('draw', solution_store.canonical_pots(pots)) != \
+        solution_store.fingerprint('journey', solution_store.canonical_pots(pots))
+
+
+def test_lookup_and_nearest(tmp_path):
+    with solution_store.SolutionStore(str(tmp_path / "store.sqlite"), commit_every=1) as store:
+        assert store.lookup('draw', {'seed': 1}) is None
+        assert store.nearest('draw', {'groups': 6}) is None
+        store.save('draw', {'seed': 1}, {'groups': {'group_A': ['Germany']}}, family={'groups': 6})
+        store.save('draw', {'seed': 2}, {'groups': {'group_A': ['Spain']}}, family={'groups': 6})
+
+        assert store.lookup('draw', {'seed': 1}) == {'groups': {'group_A': ['Germany']}}
+        # Le plus récemment utilisé de la famille : la lecture ci-dessus le remet en tête
+        assert store.nearest('draw', {'groups': 6}) == {'groups': {'group_A': ['Germany']}}
+        assert store.stats()['draw']['entries'] == 2
@@ -0,0 +1,222 @@
+import argparse
+import json
+import math
+import time
+
+import numpy as np
+
+from UEFA_EURO2024 import MyModel, SolverConfig, TournamentData, ThirdPlaceTable, third_place_slots
+
+
+def group_letter(group_name):
+    return group_name[-1]
+
+
+def poisson_thresholds(means, max_goals=15):
+    # Fonction de répartition de la loi de Poisson de chaque match, tronquée à max_goals (max_goals × matchs) :
+    # le nombre de buts est le nombre de seuils dépassés par un tirage uniforme (méthode d'inversion)
+    means = np.asarray(means, dtype=np.float64)
+    pmf = np.array([np.exp(-means) * means ** k / math.factorial(k) for k in range(max_goals)])
+    return np.cumsum(pmf, axis=0).astype(np.float32)
+
+
+def sample_goals(rng, thresholds, size):
+    uniform = rng.random((size, thresholds.shape[1]), dtype=np.float32)
+    goals = np.zeros_like(uniform)
+    for threshold in thresholds:
+        goals += uniform > threshold
+    return goals
+
+
+class TournamentSimulator:
+    # Simulation Monte-Carlo vectorisée d'un calendrier : les réplications sont traitées par lots, chaque
+    # grandeur est un tableau (réplications, ...) et aucune boucle Python ne porte sur les réplications.
+    # Buts des matchs de groupe tirés selon une loi de Poisson dont la moyenne dépend de l'écart de classement
+    # Elo ; vainqueur d'un match à élimination directe tiré avec la probabilité Elo (prolongation et tirs au but
+    # compris). Départage des groupes : points, différence de buts, buts marqués, puis tirage au sort.
+    def __init__(self, data, groups, journeys, knockout_matches, ratings=None, default_rating=1500.0,
+                 goals_per_team=1.3):
+        self.data = data
+        self.teams = list(data.teams)
+        self.team_index = {team: i for i, team in enumerate(self.teams)}
+        self.group_names = list(groups)
+        self.knockout_matches = sorted(knockout_matches, key=lambda match: match['match_id'])
+        ratings = ratings or {}
+        self.ratings = np.array([ratings.get(team, default_rating) for team in self.teams], dtype=np.float64)
+
+        # Composition des groupes (groupes × positions) et matchs de groupe (codes d'équipes)
+        self.group_members = np.array([[self.team_index[team] for team in groups[group_name]]
+                                       for group_name in self.group_names], dtype=np.int64)
+        fixtures = [(self.team_index[match[0]], self.team_index[match[1]]) for matches in journeys for match in matches]
+        self.home = np.array([team1 for team1, _ in fixtures], dtype=np.int64)
+        self.away = np.array([team2 for _, team2 in fixtures], dtype=np.int64)
+        difference = (self.ratings[self.home] - self.ratings[self.away]) / 800
+        self.home_thresholds = poisson_thresholds(goals_per_team * 10 ** difference)
+        self.away_thresholds = poisson_thresholds(goals_per_team * 10 ** -difference)
+        # Matrices d'incidence match -> équipe, pour cumuler points et buts par produit matriciel
+        num_teams = len(self.teams)
+        self.home_incidence = np.zeros((len(fixtures), num_teams), dtype=np.float32)
+        self.home_incidence[np.arange(len(fixtures)), self.home] = 1
+        self.away_incidence = np.zeros((len(fixtures), num_teams), dtype=np.float32)
+        self.away_incidence[np.arange(len(fixtures)), self.away] = 1
+
+        # Places de meilleurs troisièmes (match, côté) et table précalculée, sous forme de tableau indexé par masque
+        first_round = [match for match in self.knockout_matches if match['phase'] == self.knockout_matches[0]['phase']]
+        slots = third_place_slots([(match['team1'], match['team2']) for match in first_round], self.group_names)
+        self.third_slots = [(first_round[index]['match_id'], side, allowed) for index, side, allowed in slots]
+        self.third_table = None
+        if slots:
+            table = ThirdPlaceTable.load_or_build(slots, len(self.group_names))
+            self.third_table = np.array([assignment or (-1,) * len(slots) for assignment in table.assignments],
+                                        dtype=np.int64)
+
+    def run(self, num_replicates, batch_size=100000, seed=None):
+        # Cumule, sur toutes les réplications : présence de chaque équipe dans chaque match de la phase finale,
+        # titres et classements de groupe
+        rng = np.random.default_rng(seed)
+        num_teams = len(self.teams)
+        appearances = {match['match_id']: np.zeros(num_teams, dtype=np.int64) for match in self.knockout_matches}
+        champions = np.zeros(num_teams, dtype=np.int64)
+        group_positions = np.zeros((num_teams, self.group_members.shape[1]), dtype=np.int64)
+        done = 0
+        while done < num_replicates:
+            size = min(batch_size, num_replicates - done)
+            ranked, participants, winners = self.simulate_batch(size, rng)
+            for position in range(ranked.shape[2]):
+                group_positions[:, position] += np.bincount(ranked[:, :, position].ravel(), minlength=num_teams)
+            for match_id, (team1, team2) in participants.items():
+                appearances[match_id] += np.bincount(team1, minlength=num_teams)
+                appearances[match_id] += np.bincount(team2, minlength=num_teams)
+            champions += np.bincount(winners[self.knockout_matches[-1]['match_id']], minlength=num_teams)
+            done += size
+        return {
+            'replicates': num_replicates,
+            'appearances': appearances,
+            'champions': champions,
+            'group_positions': group_positions
+        }
+
+    def simulate_batch(self, size, rng):
+        # Une réplication par ligne : classements de groupe (réplications × groupes × positions), puis
+        # participants et vainqueurs de chaque match de la phase finale (tableaux de codes d'équipes)
+        # Tout reste en float32 : les produits matriciels avec les matrices d'incidence restent rapides
+        home_goals = sample_goals(rng, self.home_thresholds, size)
+        away_goals = sample_goals(rng, self.away_thresholds, size)
+        home_wins = (home_goals > away_goals).astype(np.float32)
+        draws = (home_goals == away_goals).astype(np.float32)
+        home_points = 3 * home_wins + draws
+        away_points = 3 * (1 - home_wins - draws) + draws
+        points = home_points @ self.home_incidence + away_points @ self.away_incidence
+        scored = home_goals @ self.home_incidence + away_goals @ self.away_incidence
+        conceded = away_goals @ self.home_incidence + home_goals @ self.away_incidence
+
+        # Clé de classement : points, différence de buts, buts marqués, puis tirage au sort
+        keys = (((points * 256 + np.clip(scored - conceded, -127, 127) + 128) * 64
+                 + np.minimum(scored, 63)).astype(np.float64) + rng.random((size, len(self.teams))))
+        group_keys = keys[:, self.group_members]
+        order = np.argsort(-group_keys, axis=2)
+        ranked = np.take_along_axis(np.broadcast_to(self.group_members, group_keys.shape), order, axis=2)
+        ranked_keys = np.take_along_axis(group_keys, order, axis=2)
+
+        # Meilleurs troisièmes : masque des groupes qualifiés, puis place de chacun d'après la table
+        thirds = None
+        if self.third_slots:
+            best_groups = np.argsort(-ranked_keys[:, :, 2], axis=1)[:, :len(self.third_slots)]
+            masks = np.bitwise_or.reduce(np.left_shift(1, best_groups), axis=1)
+            thirds = np.take_along_axis(ranked[:, :, 2], self.third_table[masks], axis=1)
+
+        letters = [group_letter(group_name) for group_name in self.group_names]
+        third_slot_index = {(match_id, side): i for i, (match_id, side, _) in enumerate(self.third_slots)}
+        participants = {}
+        winners = {}
+        for match in self.knockout_matches:
+            sides = []
+            for side, label in enumerate((match['team1'], match['team2'])):
+                if (match['match_id'], side) in third_slot_index:
+                    sides.append(thirds[:, third_slot_index[(match['match_id'], side)]])
+                elif label.startswith('W'):
+                    sides.append(winners[int(label[1:])])
+                else:
+                    sides.append(ranked[:, letters.index(label[1]), int(label[0]) - 1])
+            team1, team2 = sides
+            win_probability = 1 / (1 + 10 ** ((self.ratings[team2] - self.ratings[team1]) / 400))
+            participants[match['match_id']] = (team1, team2)
+            winners[match['match_id']] = np.where(rng.random(size) < win_probability, team1, team2)
+        return ranked, participants, winners
+
+    def appearance_probabilities(self, result, top=None):
+        # Probabilité de présence de chaque équipe dans chaque match de la phase finale (les plus probables d'abord)
+        probabilities = {}
+        for match_id, counts in result['appearances'].items():
+            order = np.argsort(-counts, kind='stable')[:top]
+            probabilities[match_id] = {self.teams[i]: counts[i] / result['replicates'] for i in order if counts[i]}
+        return probabilities
+
+    def stadium_demand(self, result, journeys):
+        # Nombre moyen de matchs de chaque équipe dans chaque stade : matchs de groupe (certains) et matchs de
+        # la phase finale (pondérés par la probabilité de présence)
+        demand = {stadium: np.zeros(len(self.teams)) for stadium in self.data.stadiums}
+        for matches in journeys:
+            for team1, team2, day, time_slot, stadium in matches:
+                demand[stadium][self.team_index[team1]] += 1
+                demand[stadium][self.team_index[team2]] += 1
+        for match in self.knockout_matches:
+            demand[match['stade']] += result['appearances'][match['match_id']] / result['replicates']
+        return {stadium: {self.teams[i]: float(expected[i]) for i in np.flatnonzero(expected)}
+                for stadium, expected in demand.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo simulation of a generated EURO 2024 schedule")
+    parser.add_argument("--config", metavar="PATH", help="tournament format as JSON (default: EURO 2024)")
+    parser.add_argument("--replicates", type=int, default=1000000, help="number of simulated tournaments")
+    parser.add_argument("--batch-size", type=int, default=100000, help="tournaments simulated at once")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the schedule and the simulation")
+    parser.add_argument("--ratings", metavar="PATH", help="JSON file of Elo ratings by team (default 1500)")
+    parser.add_argument("--top", type=int, default=3, help="most likely teams shown for each knockout match")
+    parser.add_argument("--json", metavar="PATH", help="write match probabilities and stadium demand as JSON")
+    args = parser.parse_args(argv)
+
+    ratings = {}
+    if args.ratings:
+        with open(args.ratings) as ratings_file:
+            ratings = json.load(ratings_file)
+
+    # Calendrier du pipeline séquentiel
+    solver_config = SolverConfig(random_seed=args.seed)
+    data = TournamentData.from_config(args.config, solver_config) if args.config else TournamentData(solver_config)
+    model = MyModel(data)
+    model.setup_model()
+    groups = model.solve()
+    if not groups:
+        print("Failed to draw groups, cannot simulate.")
+        return
+    model.setup_model2(groups)
+    journeys = model.journeys
+    knockout_matches = model.schedule_knockout_phase(data)
+
+    simulator = TournamentSimulator(data, groups, journeys, knockout_matches, ratings)
+    start = time.perf_counter()
+    result = simulator.run(args.replicates, args.batch_size, args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"{args.replicates} tournaments simulated in {elapsed:.1f}s ({args.replicates / elapsed:.0f} per sec)")
+
+    probabilities = simulator.appearance_probabilities(result, args.top)
+    for match in simulator.knockout_matches:
+        teams = ", ".join(f"{team} {p:.1%}" for team, p in probabilities[match['match_id']].items())
+        print(f"Match {match['match_id']} - {match['day']} - {match['stade']}: {teams}")
+    champions = sorted(zip(result['champions'], simulator.teams), reverse=True)[:args.top]
+    print("Champion: " + ", ".join(f"{team} {count / args.replicates:.1%}" for count, team in champions))
+
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump({
+                'replicates': args.replicates,
+                'matches': {str(match_id): teams
+                            for match_id, teams in simulator.appearance_probabilities(result).items()},
+                'stadium_demand': simulator.stadium_demand(result, journeys)
+            }, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()